@@ -4,35 +4,86 @@ Browser-based Smart Crawler - Uses real browser to bypass bot protection
 Works inside Cursor with browser MCP
 """
 
-import csv
 import re
-from typing import List, Dict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Set
 from urllib.parse import urljoin, urlparse
 
+# Patterns are compiled once at import and shared by every crawl
+_PRODUCT_URL_RE = re.compile(
+    r'/(?:p/\d+'                         # Total Wine
+    r'|dp/[A-Z0-9]+'                     # Amazon
+    r'|products/[\w-]+'                  # Shopify stores
+    r'|item/\d+'                         # eBay
+    r'|shop/[\w-]+/[\w-]+/[\w-]+-\d+)'   # Category-nested shops
+)
+# Tried in order, so a /p/ SKU beats /dp/ and /products/ ones wherever they sit in the URL
+_SKU_URL_RES = tuple(re.compile(p) for p in (r'/p/([^/?]+)', r'/dp/([^/?]+)', r'/products/[\w-]+-(\d+)'))
+# Image URL whose path (query string / fragment aside) ends in a known extension
+_IMG_URL = r'[^"?#]*\.(?:jpg|jpeg|png|webp)(?:[?#][^"]*)?'
+_DESC_RE = re.compile(r'(?:description|about|details)[:\s]+([^\n]{50,500})', re.IGNORECASE)
+
+# One alternation covering every per-product capture, so a snapshot is walked once.
+# Each alternative is a zero-width lookahead: nothing is consumed, so a long capture
+# (Brand spans newlines) can't swallow a later field, and every position is tried.
+# Case-sensitive pieces keep their original semantics via scoped (?-i:...) groups.
+_SNAPSHOT_RE = re.compile(
+    r'(?=(?-i:heading\s+"(?P<title>[^"]+)"[^\n]*\[level=1\]))'
+    r'|(?=(?:was|originally|list|msrp|previously)[^\n]*?\$(?P<msrp>\d+\.\d{2}))'
+    r'|(?=\$(?P<price>\d+\.\d{2}))'
+    r'|(?=SKU[:\s]+(?P<sku>[A-Z0-9-]+))'
+    r'|(?=(?-i:Brand[:\s]+(?P<brand>[A-Za-z0-9\s&-]+)))'
+    rf'|(?=(?-i:(?:src|data-src)=")(?P<image>{_IMG_URL})")',
+    re.IGNORECASE,
+)
+_SNAPSHOT_GROUPS = ('title', 'msrp', 'price', 'sku', 'brand', 'image')
+
+@lru_cache(maxsize=256)
+def _field_pattern(field_name: str) -> re.Pattern:
+    """Compiled 'Field Name: value' pattern for a custom field"""
+    return re.compile(rf'{re.escape(field_name)}[:\s]+([^\n]+)', re.IGNORECASE)
+
+# product_type -> extra_fields, so repeated crawler construction is free
+_EXTRA_FIELDS_CACHE: Dict[str, List[str]] = {}
+
+def _load_extra_fields(product_type: str) -> List[str]:
+    """Extra fields from config/products/<type>.yaml, or [] if there is no config"""
+    cached = _EXTRA_FIELDS_CACHE.get(product_type)
+    if cached is not None:
+        return cached
+    
+    config_path = Path(__file__).parent / "config" / "products" / f"{product_type}.yaml"
+    if not config_path.exists():
+        _EXTRA_FIELDS_CACHE[product_type] = []
+        return []
+    
+    # Only pull in the YAML stack when there is a file to parse
+    try:
+        from config.config_manager import load_product_config
+        extra_fields = load_product_config(product_type).get('extra_fields') or []
+    except Exception as e:
+        print(f"⚠️ Could not load product config for {product_type}: {e}")
+        extra_fields = []
+    
+    _EXTRA_FIELDS_CACHE[product_type] = extra_fields
+    return extra_fields
+
 class BrowserCrawler:
     """Crawler that uses browser MCP tools"""
     
     def __init__(self, product_type: str = "generic"):
         self.product_type = product_type
         self.base_url = ""
-        self.extra_fields = []
-        
-        # Load extra fields from config if exists
-        try:
-            import yaml
-            from pathlib import Path
-            config_path = Path(__file__).parent / "config" / "products" / f"{product_type}.yaml"
-            if config_path.exists():
-                with open(config_path) as f:
-                    config = yaml.safe_load(f)
-                    self.extra_fields = config.get('extra_fields', [])
-        except:
-            pass
+        self.extra_fields = _load_extra_fields(product_type)
+        # Field patterns are fixed for the crawler's lifetime, so resolve them up front
+        self._field_res = {name: _field_pattern(name) for name in self.extra_fields}
     
     def extract_product_links_from_snapshot(self, snapshot_yaml: str, base_url: str) -> List[str]:
         """Extract product links from browser snapshot"""
         
-        product_urls = []
+        product_urls: List[str] = []
+        seen: Set[str] = set()
         
         # Parse snapshot to find links
         # Snapshot contains lines like:
@@ -40,34 +91,39 @@ class BrowserCrawler:
         #     - /url: /products/product-name
         
         lines = snapshot_yaml.split('\n')
-        current_url = None
+        
+        # Root-relative links are the common case; joining them is plain concatenation
+        parsed = urlparse(base_url)
+        base_url_root = f"{parsed.scheme}://{parsed.netloc}" if parsed.netloc else ''
         
         for line in lines:
-            # Look for URL lines
-            if '/url:' in line:
-                url_match = re.search(r'/url:\s*(.+)', line)
-                if url_match:
-                    current_url = url_match.group(1).strip()
-                    
-                    # Check if it's a product URL
-                    if self._is_product_url(current_url):
-                        full_url = urljoin(base_url, current_url)
-                        if full_url not in product_urls:
-                            product_urls.append(full_url)
+            # Look for URL lines - a fixed prefix, so no regex needed
+            idx = line.find('/url:')
+            if idx < 0:
+                continue
+            current_url = line[idx + 5:].strip()
+            
+            # Check if it's a product URL
+            if not self._is_product_url(current_url):
+                continue
+            
+            # Order-preserving dedupe: the set keeps this linear on link-heavy pages
+            if base_url_root and current_url.startswith('/') and not current_url.startswith('//'):
+                full_url = base_url_root + current_url
+            elif current_url.startswith(('http://', 'https://')):
+                full_url = current_url
+            else:
+                full_url = urljoin(base_url, current_url)
+            if full_url in seen:
+                continue
+            seen.add(full_url)
+            product_urls.append(full_url)
         
         return product_urls
     
     def _is_product_url(self, url: str) -> bool:
         """Check if URL is a product detail page"""
-        product_patterns = [
-            r'/p/\d+',
-            r'/dp/[A-Z0-9]+',
-            r'/products/[\w-]+',
-            r'/item/\d+',
-            r'/shop/[\w-]+/[\w-]+/[\w-]+-\d+',
-        ]
-        
-        return any(re.search(pattern, url) for pattern in product_patterns)
+        return _PRODUCT_URL_RE.search(url) is not None
     
     def extract_product_data_from_snapshot(self, snapshot_yaml: str, url: str) -> Dict:
         """Extract product data from browser snapshot"""
@@ -77,98 +133,77 @@ class BrowserCrawler:
         # Extract from snapshot structure
         # The snapshot has text content we can parse
         
-        lines = snapshot_yaml.split('\n')
-        all_text = '\n'.join(lines)
+        found = self._scan_snapshot(snapshot_yaml)
         
         # Title - look for heading or og:title-like patterns
-        product['title'] = self._extract_title_from_snapshot(lines)
+        product['title'] = found['title']
         
         # Price - look for $ patterns
-        product['price'] = self._extract_price_from_snapshot(all_text, 'current')
-        product['msrp'] = self._extract_price_from_snapshot(all_text, 'compare')
+        product['price'] = found['price']
+        product['msrp'] = found['msrp']
         
-        # SKU
-        product['sku'] = self._extract_sku_from_snapshot(all_text, url)
+        # SKU - URL patterns win over page text
+        product['sku'] = self._extract_sku_from_url(url) or found['sku']
         
         # Brand
-        product['brand'] = self._extract_brand_from_snapshot(all_text)
+        product['brand'] = found['brand'].strip()
         
         # Image
-        product['image_url'] = self._extract_image_from_snapshot(lines, url)
+        product['image_url'] = urljoin(url, found['image']) if found['image'] else ''
         
         # Description
-        product['description'] = self._extract_description_from_snapshot(all_text)
+        product['description'] = self._extract_description_from_snapshot(snapshot_yaml)
         
         # Collection
-        product['collection'] = self._extract_collection_from_snapshot(all_text, url)
+        product['collection'] = self._extract_collection_from_snapshot(snapshot_yaml, url)
         
-        # Extra fields
+        # Extra fields - a field whose name never appears can't match, so skip its regex scan
+        lowered = snapshot_yaml.lower()
         for field_name in self.extra_fields:
-            product[field_name] = self._extract_field_from_snapshot(all_text, field_name)
+            if field_name.lower() in lowered:
+                product[field_name] = self._extract_field_from_snapshot(snapshot_yaml, field_name)
+            else:
+                product[field_name] = ''
         
         return product
     
-    def _extract_title_from_snapshot(self, lines: List[str]) -> str:
-        """Extract title from snapshot"""
-        for line in lines:
-            # Look for heading levels
-            if 'heading' in line and '[level=1]' in line:
-                # Next line usually has the text
-                title_match = re.search(r'heading\s+"([^"]+)"', line)
-                if title_match:
-                    return title_match.group(1)
-        
-        return ''
-    
-    def _extract_price_from_snapshot(self, text: str, price_type: str) -> str:
-        """Extract price from snapshot text"""
-        if price_type == 'current':
-            price_match = re.search(r'\$(\d+\.\d{2})', text)
-            return price_match.group(1) if price_match else ''
-        else:
-            patterns = [
-                r'(?:was|originally|list|msrp|previously).*?\$(\d+\.\d{2})',
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    return match.group(1)
-        return ''
+    def _scan_snapshot(self, text: str) -> Dict[str, str]:
+        """Collect the first title/price/msrp/sku/brand/image hit in a single pass"""
+        found = dict.fromkeys(_SNAPSHOT_GROUPS, '')
+        remaining = len(_SNAPSHOT_GROUPS)
+        
+        for match in _SNAPSHOT_RE.finditer(text):
+            group = match.lastgroup
+            if found[group]:
+                continue
+            
+            if group == 'image':
+                # Only count src attributes that sit on an img line
+                line_start = text.rfind('\n', 0, match.start()) + 1
+                line_end = text.find('\n', match.start())
+                if 'img' not in text[line_start:line_end if line_end != -1 else len(text)]:
+                    continue
+            
+            found[group] = match.group(group)
+            remaining -= 1
+            
+            if not remaining:
+                break
+        
+        return found
     
-    def _extract_sku_from_snapshot(self, text: str, url: str) -> str:
-        """Extract SKU"""
-        patterns = [
-            r'/p/([^/?]+)', r'/dp/([^/?]+)', r'/products/[\w-]+-(\d+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
+    def _extract_sku_from_url(self, url: str) -> str:
+        """Extract SKU from known product URL patterns"""
+        for pattern in _SKU_URL_RES:
+            match = pattern.search(url)
             if match:
                 return match.group(1)
-        
-        sku_match = re.search(r'SKU[:\s]+([A-Z0-9-]+)', text, re.IGNORECASE)
-        return sku_match.group(1) if sku_match else ''
-    
-    def _extract_brand_from_snapshot(self, text: str) -> str:
-        """Extract brand"""
-        brand_match = re.search(r'Brand[:\s]+([A-Za-z0-9\s&-]+)', text)
-        return brand_match.group(1).strip() if brand_match else ''
-    
-    def _extract_image_from_snapshot(self, lines: List[str], url: str) -> str:
-        """Extract image URL"""
-        for line in lines:
-            if 'img' in line and ('src=' in line or 'data-src=' in line):
-                img_match = re.search(r'(?:src|data-src)="([^"]+)"', line)
-                if img_match:
-                    img_url = img_match.group(1)
-                    if any(ext in img_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                        return urljoin(url, img_url)
         return ''
     
     def _extract_description_from_snapshot(self, text: str) -> str:
         """Extract description"""
         # Look for description-like text
-        desc_match = re.search(r'(?:description|about|details)[:\s]+([^\n]{50,500})', text, re.IGNORECASE)
+        desc_match = _DESC_RE.search(text)
         return desc_match.group(1).strip() if desc_match else ''
     
     def _extract_collection_from_snapshot(self, text: str, url: str) -> str:
@@ -180,14 +215,19 @@ class BrowserCrawler:
     
     def _extract_field_from_snapshot(self, text: str, field_name: str) -> str:
         """Extract custom field"""
-        pattern = rf'{field_name}[:\s]+([^\n]+)'
-        match = re.search(pattern, text, re.IGNORECASE)
+        pattern = self._field_res.get(field_name) or _field_pattern(field_name)
+        match = pattern.search(text)
         return match.group(1).strip() if match else ''
 
+# One crawler per product type, reused across extract_from_browser calls
+_CRAWLER_CACHE: Dict[str, BrowserCrawler] = {}
+
 # This will be called from Cursor with browser MCP access
 def extract_from_browser(snapshot_yaml: str, url: str, product_type: str = "generic") -> Dict:
     """Helper function to extract data from browser snapshot"""
-    crawler = BrowserCrawler(product_type)
+    crawler = _CRAWLER_CACHE.get(product_type)
+    if crawler is None:
+        crawler = _CRAWLER_CACHE[product_type] = BrowserCrawler(product_type)
     return crawler.extract_product_data_from_snapshot(snapshot_yaml, url)
 
 if __name__ == "__main__":
@@ -6,10 +6,12 @@ Bulk Wine Crawler - Extracts wine data from Total Wine for multiple wines
 import csv
 import time
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from operator import attrgetter
 from typing import List, Dict, Any
 
-@dataclass
+# slots: no per-instance __dict__, which adds up over a full catalog crawl
+@dataclass(slots=True)
 class WineData:
     """Wine data structure for crawling"""
     name: str
@@ -34,6 +36,9 @@ class WineData:
     image_url: str = ""
     product_highlights: str = ""
 
+# Pulls a WineData row in dataclass field order, matching the CSV header
+_WINE_ROW = attrgetter(*(f.name for f in fields(WineData)))
+
 class TotalWineCrawler:
     """Crawls wine data from Total Wine using Browser MCP"""
     
@@ -166,40 +171,17 @@ def main():
     
     # Save to CSV
     output_file = "bulk_wine_catalog.csv"
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+    # 1 MiB buffer so rows reach disk in large chunks rather than per row
+    with open(output_file, 'w', newline='', encoding='utf-8', buffering=1 << 20) as csvfile:
         fieldnames = [
             'Name', 'Brand', 'Country_State', 'Region', 'Appellation', 'Wine_Type', 'Varietal', 
             'Style', 'ABV', 'Taste_Notes', 'Body', 'SKU', 'Size', 'Price', 'Mix_6_Price', 
             'Customer_Rating', 'Customer_Reviews', 'Expert_Rating', 'URL', 'Image_URL', 'Product_Highlights'
         ]
         
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for wine in all_wines:
-            writer.writerow({
-                'Name': wine.name,
-                'Brand': wine.brand,
-                'Country_State': wine.country_state,
-                'Region': wine.region,
-                'Appellation': wine.appellation,
-                'Wine_Type': wine.wine_type,
-                'Varietal': wine.varietal,
-                'Style': wine.style,
-                'ABV': wine.abv,
-                'Taste_Notes': wine.taste_notes,
-                'Body': wine.body,
-                'SKU': wine.sku,
-                'Size': wine.size,
-                'Price': wine.price,
-                'Mix_6_Price': wine.mix_6_price,
-                'Customer_Rating': wine.customer_rating,
-                'Customer_Reviews': wine.customer_reviews,
-                'Expert_Rating': wine.expert_rating,
-                'URL': wine.url,
-                'Image_URL': wine.image_url,
-                'Product_Highlights': wine.product_highlights
-            })
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        writer.writerows(map(_WINE_ROW, all_wines))
     
     print(f"\n✅ Saved {len(all_wines)} wines to {output_file}")
     print(f"📊 Breakdown:")
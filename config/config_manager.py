@@ -5,24 +5,99 @@ import os
 import re
 from pathlib import Path
 
+# libyaml's C parser is far faster than the pure-Python one; PyYAML wheels
+# normally bundle it, but fall back cleanly when it is missing
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Only these keys of a platform section may name an environment variable, as a whole
+# "${VAR}" value; every other string (including literal '$') is left untouched
+_ENV_KEYS = ('shop_url', 'access_token')
+
+# Parsed YAML shared by every ConfigManager, keyed on (absolute path, mtime)
+# so an edited file is re-read while unchanged files are parsed only once.
+# Cached dicts are shared - copy before mutating.
+_YAML_CACHE = {}
+
+def _load_yaml(file_path: Path) -> dict:
+    st = file_path.stat()
+    key = (str(file_path.resolve()), st.st_mtime_ns)
+    cached = _YAML_CACHE.get(key)
+    if cached is not None:
+        return cached
+    
+    with open(file_path) as f:
+        config = yaml.load(f, Loader=_YamlLoader)
+    _YAML_CACHE[key] = config
+    return config
+
+def _substitute_env_vars(config: dict, platform: str) -> dict:
+    """Copy of config whose ${VAR} credentials (see _ENV_KEYS) are read from the environment"""
+    section = config.get(platform) if isinstance(config, dict) else None
+    if not isinstance(section, dict):
+        return config
+    section = dict(section)
+    for key in _ENV_KEYS:
+        val = section.get(key)
+        if isinstance(val, str) and val.startswith('${'):
+            section[key] = os.getenv(val[2:-1], '')
+    return {**config, platform: section}
+
 class ConfigManager:
     def __init__(self):
         self.config_dir = Path(__file__).parent
+        # Substituted configs, keyed by name and tied to the parsed YAML they came from
+        self._loaded_configs = {}
+        # Directory -> (mtime_ns, config names); adding or removing a file bumps the mtime
+        self._dir_cache = {}
+    
+    def _list_yaml(self, directory: Path) -> list:
+        mtime = directory.stat().st_mtime_ns
+        cached = self._dir_cache.get(directory)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        result = sorted(f.stem for f in directory.glob('*.yaml'))
+        self._dir_cache[directory] = (mtime, result)
+        return result
+    
+    def get_available_sites(self) -> list:
+        return self._list_yaml(self.config_dir / "sites")
+    
+    def get_available_products(self) -> list:
+        return self._list_yaml(self.config_dir / "products")
     
     def load_site_config(self, site_name: str) -> dict:
-        with open(self.config_dir / "sites" / f"{site_name}.yaml") as f:
-            return yaml.safe_load(f)
+        return _load_yaml(self.config_dir / "sites" / f"{site_name}.yaml")
     
     def load_product_config(self, product_type: str) -> dict:
-        with open(self.config_dir / "products" / f"{product_type}.yaml") as f:
-            return yaml.safe_load(f)
+        return _load_yaml(self.config_dir / "products" / f"{product_type}.yaml")
     
-    def load_shopify_config(self) -> dict:
-        config = yaml.safe_load(open(self.config_dir / "shopify_config.yaml"))
+    def load_platform_config(self, platform: str) -> dict:
+        raw = _load_yaml(self.config_dir / f"{platform}_config.yaml")
+        cached = self._loaded_configs.get(platform)
+        if cached is not None and cached[0] is raw:
+            return cached[1]
         # Substitute env vars
-        for key in ['shop_url', 'access_token']:
-            val = config['shopify'][key]
-            if val.startswith('${'):
-                var = val[2:-1]
-                config['shopify'][key] = os.getenv(var, '')
+        config = _substitute_env_vars(raw, platform)
+        self._loaded_configs[platform] = (raw, config)
         return config
+    
+    def load_shopify_config(self) -> dict:
+        return self.load_platform_config('shopify')
+
+# Module-level helpers share one manager instead of building a new one per call
+_default_manager = ConfigManager()
+
+def load_site_config(site_name: str) -> dict:
+    return _default_manager.load_site_config(site_name)
+
+def load_product_config(product_type: str) -> dict:
+    return _default_manager.load_product_config(product_type)
+
+def load_platform_config(platform: str) -> dict:
+    return _default_manager.load_platform_config(platform)
+
+def load_shopify_config() -> dict:
+    return _default_manager.load_shopify_config()
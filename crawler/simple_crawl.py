@@ -8,80 +8,274 @@ import asyncio
 import aiohttp
 import csv
 import argparse
+import random
 import re
 import ssl
+from contextlib import asynccontextmanager
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Set
-from bs4 import BeautifulSoup
+from typing import List, Set, Union
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+from functools import lru_cache
 from urllib.parse import urljoin
 import sys
 
 sys.path.append(str(Path(__file__).parent.parent))
 from config.config_manager import ConfigManager
 
-async def crawl_collection_pages(collection_urls: List[str], site_config: dict, product_config: dict, output_file: str):
+# lxml's C parser is several times faster than the pure-Python html.parser
+try:
+    from lxml import etree as _etree
+    HTML_PARSER = 'lxml'
+except ImportError:
+    _etree = None
+    HTML_PARSER = 'html.parser'
+
+# Standard fields (always included)
+STANDARD_FIELDS = ('title', 'price', 'collection', 'description', 'msrp', 'brand', 'sku', 'image_url')
+
+def csv_fields(product_config: dict) -> tuple:
+    """All CSV columns: standard fields, then the product config's extra fields"""
+    return STANDARD_FIELDS + tuple(product_config.get('extra_fields') or ())
+
+_PRICE_RE = re.compile(r'\$(\d+\.\d{2})')
+# Same pattern over raw bytes, for scanning a body as it streams in
+_PRICE_BYTES_RE = re.compile(rb'\$(\d+\.\d{2})')
+_SKU_RE = re.compile(r'/p/([^/?]+)')
+
+# selectolax (Lexbor) is faster still for the little this crawler reads; BS4 stays the fallback
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+@lru_cache(maxsize=64)
+def _compiled_css(selector: str):
+    """soupsieve matcher for a CSS selector, compiled once per distinct selector string"""
+    return soupsieve.compile(selector)
+
+def _select_hrefs(html: Union[str, bytes], selector: str, container_selector: str = None) -> List[str]:
+    """href of every element matching a CSS selector, optionally only inside a container element"""
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        scope = (tree.css_first(container_selector) if container_selector else None) or tree.root
+        return [node.attributes.get('href') or '' for node in scope.css(selector)]
+    soup = BeautifulSoup(html, HTML_PARSER)
+    # Searching just the listing grid skips header, footer and nav markup
+    scope = (_compiled_css(container_selector).select_one(soup) if container_selector else None) or soup
+    return [link.get('href', '') for link in _compiled_css(selector).select(scope)]
+
+def _lxml_title(root) -> str:
+    """First h1's text nodes, stripped and joined - what BeautifulSoup's get_text(strip=True) returns"""
+    if root is None:
+        return ''
+    # First-match XPath runs entirely in libxml2 and stops at the first h1
+    return ''.join(text.strip() for text in root.xpath('(//h1)[1]//text()'))
+
+_H1_STRAINER = SoupStrainer('h1')
+
+def _page_title(html: Union[str, bytes]) -> str:
+    """Text of the first h1"""
+    if LexborHTMLParser is not None:
+        h1 = LexborHTMLParser(html).css_first('h1')
+        return h1.text(strip=True) if h1 else ''
+    if _etree is not None:
+        try:
+            return _lxml_title(_etree.HTML(html))
+        except ValueError:
+            pass  # str input with an XML encoding declaration; let BeautifulSoup handle it
+    # Only h1 subtrees are built; the rest of the page is tokenized and dropped
+    h1 = BeautifulSoup(html, HTML_PARSER, parse_only=_H1_STRAINER).find('h1')
+    return h1.get_text(strip=True) if h1 else ''
+
+async def _stream_product_page(response):
+    """(first h1 text, first price) from a product page, parsed chunk by chunk as it downloads"""
+    # Without a header charset libxml2 sniffs the BOM / <meta charset> itself, as
+    # the buffered BeautifulSoup and selectolax paths do; forcing utf-8 would override that
+    if response.charset:
+        parser = _etree.HTMLParser(encoding=response.charset)
+    else:
+        parser = _etree.HTMLParser()
+    price = ''
+    carry = b''
+    
+    async for chunk in response.content.iter_chunked(1 << 16):
+        parser.feed(chunk)
+        if not price:
+            # Keep a short tail so a price split across chunks is still seen
+            window = carry + chunk
+            match = _PRICE_BYTES_RE.search(window)
+            if match:
+                price = match.group(1).decode()
+            else:
+                carry = window[-32:]
+    
+    try:
+        root = parser.close()
+    except _etree.LxmlError:
+        root = None
+    return _lxml_title(root), price
+
+class TokenBucket:
+    """Average `rate` requests per second with bursts up to `capacity`, shared by all fetches"""
+    
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = None
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        if self.rate == float('inf'):
+            return
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self.last is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.last = loop.time()
+                self.tokens = 1
+            self.tokens -= 1
+
+def _site_bucket(site_config: dict) -> TokenBucket:
+    """Token bucket honouring the site's rate_limit (seconds between requests) and optional burst"""
+    site = site_config['site']
+    rate_limit = site.get('rate_limit') or 0
+    rate = 1 / rate_limit if rate_limit > 0 else float('inf')
+    return TokenBucket(rate, site.get('burst', 1))
+
+def _build_connector() -> aiohttp.TCPConnector:
+    """Keep-alive connector pooled for crawling a single site"""
+    # Setup SSL
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    return aiohttp.TCPConnector(
+        ssl=ssl_context,
+        limit=100,
+        limit_per_host=20,
+        keepalive_timeout=75,
+        enable_cleanup_closed=True,
+        ttl_dns_cache=300,
+    )
+
+# Statuses worth another try: rate limited, or a proxy/server that is briefly unavailable
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+def _retry_delay(attempt: int, response=None) -> float:
+    """Server's Retry-After when it gives seconds, otherwise jittered exponential backoff"""
+    retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+    if retry_after.isdigit():
+        return min(int(retry_after), 30)
+    return min(2 ** attempt + random.random(), 30)
+
+@asynccontextmanager
+async def _fetch(session: aiohttp.ClientSession, url: str, bucket: TokenBucket, attempts: int = 3):
+    """GET url, retrying transient failures; permanent errors come back at once for the caller to report"""
+    for attempt in range(attempts):
+        last_try = attempt == attempts - 1
+        await bucket.acquire()
+        try:
+            response = await session.get(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if last_try:
+                raise
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+        
+        if response.status in _RETRY_STATUSES and not last_try:
+            delay = _retry_delay(attempt, response)
+            response.release()
+            await asyncio.sleep(delay)
+            continue
+        
+        try:
+            yield response
+        finally:
+            response.release()
+        return
+
+@asynccontextmanager
+async def crawler_session(site_config: dict):
+    """Pooled session for crawling a site, shared by the collection and detail phases"""
+    timeout = aiohttp.ClientTimeout(total=site_config['site'].get('timeout', 30))
+    headers = {'User-Agent': site_config['site']['user_agent']}
+    async with aiohttp.ClientSession(connector=_build_connector(), timeout=timeout, headers=headers) as session:
+        yield session
+    # Give pooled SSL transports a moment to close cleanly before the loop shuts down
+    await asyncio.sleep(0.25)
+
+async def crawl_collection_pages(collection_urls: List[str], site_config: dict, product_config: dict, output_file: str,
+                                 concurrency: int = 10):
     """Crawl collection pages to find product URLs, then crawl products"""
     
     print(f"📋 Step 1: Extracting product URLs from {len(collection_urls)} collection page(s)...")
     
-    # Extract product URLs from collection pages
-    product_urls = await extract_product_urls_from_collections(collection_urls, site_config)
-    
-    if not product_urls:
-        print("❌ No product URLs found on collection pages")
-        return
-    
-    print(f"✅ Found {len(product_urls)} product URLs\n")
-    print(f"📡 Step 2: Crawling {len(product_urls)} product detail pages...")
-    
-    # Crawl each product detail page
-    products = await crawl_product_details(product_urls, site_config, product_config)
-    
-    # Write Shopify CSV
-    if products:
-        write_shopify_csv(products, output_file, product_config)
-        print(f"\n✅ Saved {len(products)} products to {output_file}")
+    # One bucket for the whole crawl, so both phases share the site's request budget
+    bucket = _site_bucket(site_config)
+    
+    # One session for both phases, so detail pages reuse the collection pages' connections
+    async with crawler_session(site_config) as session:
+        # Extract product URLs from collection pages
+        product_urls = await extract_product_urls_from_collections(session, collection_urls, site_config, concurrency, bucket)
+        
+        if not product_urls:
+            print("❌ No product URLs found on collection pages")
+            return
+        
+        print(f"✅ Found {len(product_urls)} product URLs\n")
+        print(f"📡 Step 2: Crawling {len(product_urls)} product detail pages...")
+        
+        # Crawl each product detail page, writing Shopify CSV rows as they arrive
+        rows = CsvRowSink(output_file, csv_fields(product_config))
+        try:
+            await crawl_product_details(session, product_urls, site_config, product_config, concurrency, bucket, rows)
+        finally:
+            await asyncio.to_thread(rows.close)
+    
+    if rows:
+        print(f"\n✅ Saved {len(rows)} products to {output_file}")
     else:
         print("\n❌ No products extracted")
     
-    return products
+    return len(rows)
 
-async def extract_product_urls_from_collections(collection_urls: List[str], site_config: dict) -> Set[str]:
+async def extract_product_urls_from_collections(session: aiohttp.ClientSession, collection_urls: List[str], site_config: dict,
+                                                concurrency: int = 10, bucket: TokenBucket = None) -> Set[str]:
     """Extract product detail page URLs from collection pages"""
     
-    # Setup SSL
-    ssl_context = ssl.create_default_context()
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
-    connector = aiohttp.TCPConnector(ssl=ssl_context)
-    
-    timeout = aiohttp.ClientTimeout(total=30)
-    headers = {'User-Agent': site_config['site']['user_agent']}
     base_url = site_config['site']['base_url']
     
     product_urls = set()
     collection_config = site_config.get('collection_page', {})
     link_selector = collection_config.get('product_link_selector', "a[href*='/p/']")
-    link_pattern = collection_config.get('product_link_pattern', "/p/\\d+")
+    link_re = re.compile(collection_config.get('product_link_pattern', "/p/\\d+"))
+    container_selector = collection_config.get('listing_container_selector')
     
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
-        for i, url in enumerate(collection_urls, 1):
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = bucket or _site_bucket(site_config)
+    
+    async def scan(i: int, url: str):
+        async with semaphore:
             print(f"  [{i}/{len(collection_urls)}] Scanning collection: {url}")
             
             try:
-                async with session.get(url) as response:
+                async with _fetch(session, url, bucket) as response:
                     if response.status == 200:
-                        html = await response.text()
-                        soup = BeautifulSoup(html, 'html.parser')
+                        # Raw bytes: the parser detects the encoding in C, skipping aiohttp's charset sniff
+                        html = await response.read()
                         
                         # Find all product links
-                        links = soup.select(link_selector)
+                        links = _select_hrefs(html, link_selector, container_selector)
                         
-                        for link in links:
-                            href = link.get('href', '')
-                            if re.search(link_pattern, href):
-                                full_url = urljoin(base_url, href)
-                                product_urls.add(full_url)
+                        # One bulk update per page instead of an add() per anchor
+                        product_urls.update(urljoin(base_url, href) for href in links if href and link_re.search(href))
                         
                         print(f"     Found {len(links)} product links")
                     else:
@@ -89,39 +283,40 @@ async def extract_product_urls_from_collections(collection_urls: List[str], site
                         
             except Exception as e:
                 print(f"     ❌ Error: {e}")
-            
-            await asyncio.sleep(site_config['site']['rate_limit'])
+    
+    await asyncio.gather(*(scan(i, url) for i, url in enumerate(collection_urls, 1)))
     
     return product_urls
 
-async def crawl_product_details(product_urls: List[str], site_config: dict, product_config: dict) -> List[dict]:
-    """Crawl product detail pages and extract data"""
-    
-    # Setup SSL
-    ssl_context = ssl.create_default_context()
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
-    connector = aiohttp.TCPConnector(ssl=ssl_context)
-    
-    timeout = aiohttp.ClientTimeout(total=30)
-    headers = {'User-Agent': site_config['site']['user_agent']}
-    
-    products = []
-    product_urls_list = sorted(list(product_urls))
-    
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
-        for i, url in enumerate(product_urls_list, 1):
+async def crawl_product_details(session: aiohttp.ClientSession, product_urls: List[str], site_config: dict, product_config: dict,
+                                concurrency: int = 10, bucket: TokenBucket = None, products=None) -> List[dict]:
+    """Crawl product detail pages and extract data, appending each product to `products` as it is extracted"""
+    
+    # Set order is fine for fetching; sorting only tidied the progress output
+    product_urls_list = list(product_urls)
+    fields = csv_fields(product_config)
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = bucket or _site_bucket(site_config)
+    products = [] if products is None else products
+    
+    async def crawl(i: int, url: str):
+        async with semaphore:
             print(f"  [{i}/{len(product_urls_list)}] Crawling: {url}")
             
             try:
-                async with session.get(url) as response:
+                async with _fetch(session, url, bucket) as response:
                     if response.status == 200:
-                        html = await response.text()
-                        product = extract_product_data(html, url, site_config, product_config)
+                        if _etree is not None and LexborHTMLParser is None:
+                            # Parse while the body downloads instead of buffering it all first
+                            title, price = await _stream_product_page(response)
+                            product = build_product(url, title, price, fields)
+                        else:
+                            html = await response.read()
+                            product = extract_product_data(html, url, site_config, fields)
                         
                         if product.get('name'):
-                            products.append(product)
                             print(f"      ✅ {product['name']}")
+                            products.append(product)
                         else:
                             print(f"      ⚠️  No data extracted")
                     else:
@@ -129,59 +324,79 @@ async def crawl_product_details(product_urls: List[str], site_config: dict, prod
                         
             except Exception as e:
                 print(f"      ❌ Error: {e}")
-            
-            await asyncio.sleep(site_config['site']['rate_limit'])
+    
+    await asyncio.gather(*(crawl(i, url) for i, url in enumerate(product_urls_list, 1)))
     
     return products
 
-def extract_product_data(html: str, url: str, site_config: dict, product_config: dict) -> dict:
-    """Extract product data from HTML"""
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    product = {}
+def extract_product_data(html: Union[str, bytes], url: str, site_config: dict, fields: tuple) -> dict:
+    """Extract product data from HTML, given as text or as the raw response body"""
+    # Scan the raw markup; flattening the whole tree to text just for this regex costs a full walk
+    if isinstance(html, bytes):
+        price_match = _PRICE_BYTES_RE.search(html)
+        price = price_match.group(1).decode() if price_match else ''
+    else:
+        price_match = _PRICE_RE.search(html)
+        price = price_match.group(1) if price_match else ''
+    return build_product(url, _page_title(html), price, fields)
+
+def build_product(url: str, title: str, price: str, fields: tuple) -> dict:
+    """Product row from the fields read off its page"""
+    # Every column starts blank; brand, collection, description, msrp, image_url
+    # and the extra fields aren't extracted from the page yet
+    product = dict.fromkeys(fields, '')
     
     # Standard fields (always extract these)
-    h1 = soup.find('h1')
-    product['title'] = h1.get_text(strip=True) if h1 else ''
+    product['title'] = title
     
     product['sku'] = extract_sku_from_url(url)
     
-    price_match = re.search(r'\$(\d+\.\d{2})', soup.get_text())
-    product['price'] = price_match.group(1) if price_match else ''
-    
-    product['brand'] = ''  # Extract from page
-    product['collection'] = ''  # Determine from URL or page
-    product['description'] = ''  # Extract from page  
-    product['msrp'] = ''  # Compare at price
-    product['image_url'] = ''  # Extract image
-    
-    # Extra fields from product config
-    for field_name in product_config.get('extra_fields', []):
-        product[field_name] = ''  # Extract based on selectors
+    product['price'] = price
     
     return product
 
 def extract_sku_from_url(url: str) -> str:
     """Extract SKU from URL"""
-    match = re.search(r'/p/([^/?]+)', url)
+    match = _SKU_RE.search(url)
     return match.group(1) if match else ''
 
-def write_shopify_csv(products: List[dict], output_file: str, product_config: dict):
-    """Write Shopify-compatible CSV"""
-    
-    # Standard fields (always included)
-    standard_fields = ['title', 'price', 'collection', 'description', 'msrp', 'brand', 'sku', 'image_url']
-    
-    # Extra fields from product config
-    extra_fields = product_config.get('extra_fields', [])
-    
-    # All columns
-    all_fields = standard_fields + extra_fields
-    
-    with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=all_fields, extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows(products)
+class CsvRowSink:
+    """List-like target for crawl_product_details that writes each product straight to CSV instead of keeping it"""
+    
+    def __init__(self, output_file: str, fields: tuple, flush_every: int = 100):
+        self.output_file = output_file
+        self.fields = fields
+        self._row = itemgetter(*fields)
+        self._file = None
+        self._writer = None
+        self.flush_every = flush_every
+        self.count = 0
+    
+    def append(self, product: dict):
+        # The file is created with the first product, so a crawl that extracts nothing writes no file
+        if self._file is None:
+            # 1 MiB buffer: the csv module's per-row writes reach disk in large chunks
+            self._file = open(self.output_file, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.fields)
+        self._writer.writerow(self._row(product))
+        self.count += 1
+        # Periodic flushes keep partial results on disk if the crawl dies
+        if self.count % self.flush_every == 0:
+            self._file.flush()
+    
+    def __len__(self):
+        return self.count
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def read_collection_urls(path: str) -> List[str]:
+    """Collection page URLs from a file, one per line, skipping blanks and # comments"""
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
 
 async def main():
     parser = argparse.ArgumentParser(description="Simple Shopify Crawler - Collection Pages")
@@ -189,17 +404,24 @@ async def main():
     parser.add_argument("--product", required=True, help="Product config name (e.g., 'wine')")
     parser.add_argument("--collections", required=True, help="File with collection page URLs")
     parser.add_argument("--output", required=True, help="Output CSV file")
+    parser.add_argument("--concurrency", type=int, default=10, help="Pages fetched in parallel")
     
     args = parser.parse_args()
     
     # Load configs
     config_manager = ConfigManager()
+    if args.site not in config_manager.get_available_sites():
+        print(f"❌ Unknown site config '{args.site}'. Available: {', '.join(config_manager.get_available_sites())}")
+        return
+    if args.product not in config_manager.get_available_products():
+        print(f"❌ Unknown product config '{args.product}'. Available: {', '.join(config_manager.get_available_products())}")
+        return
+    
     site_config = config_manager.load_site_config(args.site)
     product_config = config_manager.load_product_config(args.product)
     
     # Load collection page URLs
-    with open(args.collections, 'r') as f:
-        collection_urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    collection_urls = await asyncio.to_thread(read_collection_urls, args.collections)
     
     print(f"🕷️  Collection Page Crawler for Shopify")
     print(f"Site: {site_config['site']['name']}")
@@ -208,7 +430,7 @@ async def main():
     print("=" * 50)
     
     # Crawl
-    await crawl_collection_pages(collection_urls, site_config, product_config, args.output)
+    await crawl_collection_pages(collection_urls, site_config, product_config, args.output, args.concurrency)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -71,10 +71,8 @@ def main():
         }
     ]
     
-    # GraphQL mutation for smart collection creation
-    create_mutation = """
-    mutation collectionCreate($input: CollectionInput!) {
-      collectionCreate(input: $input) {
+    # GraphQL selection returned for each created collection
+    collection_fields = """
         collection {
           id
           handle
@@ -92,48 +90,59 @@ def main():
           field
           message
         }
-      }
-    }
     """
     
+    # All collections go in one aliased mutation document: one round trip instead of one per collection
+    aliases = [f"c{i}" for i in range(len(smart_collections))]
+    create_mutation = "mutation createCollections({}) {{\n{}\n}}".format(
+        ", ".join(f"${alias}: CollectionInput!" for alias in aliases),
+        "\n".join(f"  {alias}: collectionCreate(input: ${alias}) {{{collection_fields}}}" for alias in aliases),
+    )
+    
+    variables = {
+        alias: {
+            "handle": collection_data["handle"],
+            "title": collection_data["title"],
+            "descriptionHtml": collection_data["description"],
+            "ruleSet": {
+                "appliedDisjunctively": False,
+                "rules": [collection_data["rule"]]
+            }
+        }
+        for alias, collection_data in zip(aliases, smart_collections)
+    }
+    
+    payload = {
+        "query": create_mutation,
+        "variables": variables
+    }
+    
     url = f"{SHOP_URL}/admin/api/{API_VERSION}/graphql.json"
     success_count = 0
     
     print(f"📋 Creating {len(smart_collections)} smart wine collections with sales channels...")
     print()
     
-    for collection_data in smart_collections:
-        variables = {
-            "input": {
-                "handle": collection_data["handle"],
-                "title": collection_data["title"],
-                "descriptionHtml": collection_data["description"],
-                "ruleSet": {
-                    "appliedDisjunctively": False,
-                    "rules": [collection_data["rule"]]
-                }
-            }
-        }
-        
-        payload = {
-            "query": create_mutation,
-            "variables": variables
-        }
+    try:
+        response = requests.post(url, headers=headers, json=payload)
         
-        try:
-            response = requests.post(url, headers=headers, json=payload)
+        if response.status_code == 200:
+            data = response.json()
+            results = data.get('data') or {}
+            if not results and data.get('errors'):
+                print(f"❌ {data['errors']}")
             
-            if response.status_code == 200:
-                data = response.json()
+            for alias, collection_data in zip(aliases, smart_collections):
+                result = results.get(alias) or {}
                 
-                if data.get('data', {}).get('collectionCreate', {}).get('collection'):
-                    new_collection = data['data']['collectionCreate']['collection']
+                if result.get('collection'):
+                    new_collection = result['collection']
                     rule_info = new_collection.get('ruleSet', {}).get('rules', [{}])[0]
                     print(f"✅ {new_collection['title']}")
                     print(f"   Rule: {rule_info.get('column')} {rule_info.get('relation')} '{rule_info.get('condition')}'")
                     success_count += 1
-                elif data.get('data', {}).get('collectionCreate', {}).get('userErrors'):
-                    errors = data['data']['collectionCreate']['userErrors']
+                elif result.get('userErrors'):
+                    errors = result['userErrors']
                     if any('already exists' in str(error).lower() for error in errors):
                         print(f"⚠️ {collection_data['title']} (Already exists)")
                         success_count += 1
@@ -141,11 +150,11 @@ def main():
                         print(f"❌ {collection_data['title']} → {errors}")
                 else:
                     print(f"❌ {collection_data['title']} → Unexpected response")
-            else:
-                print(f"❌ {collection_data['title']} → HTTP {response.status_code}")
-                
-        except Exception as e:
-            print(f"❌ {collection_data['title']} → Error: {e}")
+        else:
+            print(f"❌ HTTP {response.status_code}")
+            
+    except Exception as e:
+        print(f"❌ Error: {e}")
     
     print(f"\n📊 Results: {success_count}/{len(smart_collections)} smart collections created")
     
@@ -4,19 +4,145 @@ Shopify Product Image Resizer
 Downloads existing product images, checks dimensions, and resizes canvas to 750px if width < 400px
 """
 
+import multiprocessing
 import os
+import re
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from PIL import Image
+from PIL import Image, ImageFile
 from io import BytesIO
+import threading
 import time
-from typing import Dict, List, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 from config import SHOPIFY_CONFIG
+from shopify_wine_importer import ShopifyRetry
+
+# ijson decodes a products page incrementally from the socket instead of materializing the whole body
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# numpy builds the padded canvas as one zeroed array and a single slice copy; PIL's paste is the fallback
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The rel="next" entry of a Link header; the header also carries rel="previous" after page 1
+_NEXT_LINK_RE = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+# Staged upload flow: raw bytes go to Shopify's storage target, then get attached as product media
+_STAGED_UPLOADS_CREATE = """
+mutation stagedUploadsCreate($input: [StagedUploadInput!]!) {
+  stagedUploadsCreate(input: $input) {
+    stagedTargets { url resourceUrl parameters { name value } }
+    userErrors { field message }
+  }
+}
+"""
+_PRODUCT_CREATE_MEDIA = """
+mutation productCreateMedia($productId: ID!, $media: [CreateMediaInput!]!) {
+  productCreateMedia(productId: $productId, media: $media) {
+    media { id status }
+    mediaUserErrors { field message }
+  }
+}
+"""
+# Media is processed asynchronously after productCreateMedia; it can only replace an image once READY
+_MEDIA_STATUS = """
+query mediaStatus($id: ID!) {
+  node(id: $id) {
+    ... on MediaImage { status mediaErrors { message } }
+  }
+}
+"""
+_PRODUCT_REORDER_MEDIA = """
+mutation productReorderMedia($id: ID!, $moves: [MoveInput!]!) {
+  productReorderMedia(id: $id, moves: $moves) {
+    userErrors { field message }
+  }
+}
+"""
+
+def _pooled_session() -> requests.Session:
+    """Keep-alive session that backs off on Shopify's 429s (POSTs included) and transient 5xx errors"""
+    session = requests.Session()
+    retry = ShopifyRetry(total=5, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
+    # One pool for the Admin API host, one for the image CDN
+    session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=32, max_retries=retry))
+    return session
+
+def _encode_canvas(raw_image: bytes, target_width: int, output_ext: str) -> bytes:
+    """Center an encoded image on a transparent canvas of target_width and re-encode it"""
+    image = Image.open(BytesIO(raw_image))
+    original_width, original_height = image.size
+    
+    # Center the original image on a transparent canvas of the target width, keeping original height
+    x_offset = (target_width - original_width) // 2
+    if np is not None:
+        canvas = np.zeros((original_height, target_width, 4), dtype=np.uint8)
+        canvas[:, x_offset:x_offset + original_width] = np.asarray(image.convert('RGBA'))
+        new_image = Image.fromarray(canvas, 'RGBA')
+    else:
+        new_image = Image.new('RGBA', (target_width, original_height), (0, 0, 0, 0))
+        new_image.paste(image, (x_offset, 0))
+    
+    # Encode resized image - lossy WebP if requested, otherwise a fully optimized lossless PNG
+    buffer = BytesIO()
+    if output_ext == 'webp':
+        new_image.save(buffer, 'WEBP', quality=85, method=4)
+    else:
+        new_image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+class ShopifyRateLimiter:
+    """Leaky-bucket view of Shopify's call limit, shared by every worker thread; only blocks near the cap"""
+    
+    def __init__(self, limit: float = 40, leak_rate: float = 2.0, threshold: float = 0.8):
+        self.used = 0.0
+        self.limit = limit
+        self.leak_rate = leak_rate
+        self.threshold = threshold
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _level(self, now: float) -> float:
+        return max(0.0, self.used - (now - self.updated) * self.leak_rate)
+    
+    def wait(self, cost: float = 1):
+        # Reserve the call's cost under the lock, sleep outside it so other threads can queue up
+        with self.lock:
+            now = time.monotonic()
+            used = self._level(now) + cost
+            delay = (used - 0.5 * self.limit) / self.leak_rate if used > self.threshold * self.limit else 0
+            self.used = used
+            self.updated = now
+        if delay > 0:
+            time.sleep(delay)
+    
+    def update(self, used: float, limit: float, leak_rate: float = None):
+        """Sync with the bucket level Shopify reported on a response"""
+        with self.lock:
+            self.used, self.limit = used, limit
+            if leak_rate:
+                self.leak_rate = leak_rate
+            self.updated = time.monotonic()
+    
+    def update_from_headers(self, response: requests.Response):
+        # REST responses carry "used/limit", e.g. "35/40"
+        used, _, limit = response.headers.get('X-Shopify-Shop-Api-Call-Limit', '').partition('/')
+        if used.isdigit() and limit.isdigit():
+            self.update(int(used), int(limit))
 
 class ShopifyImageResizer:
     """Handles downloading, resizing, and re-uploading Shopify product images"""
     
-    def __init__(self):
+    def __init__(self, max_workers: int = 16, save_originals: bool = False, webp: bool = False):
         self.shop_url = SHOPIFY_CONFIG['SHOP_URL']
         self.access_token = SHOPIFY_CONFIG['ACCESS_TOKEN']
         self.api_version = SHOPIFY_CONFIG['API_VERSION']
@@ -24,10 +150,26 @@ class ShopifyImageResizer:
             'X-Shopify-Access-Token': self.access_token,
             'Content-Type': 'application/json'
         }
+        # Admin API headers are passed per call so the token never goes to the image CDN
+        self.session = _pooled_session()
+        # Products are processed on a thread pool; uploads share one Shopify rate limit
+        self.max_workers = max_workers
+        self.rate_limiter = ShopifyRateLimiter()
+        # GraphQL has its own cost-based bucket (1000 points, restoring 50/s)
+        self.graphql_limiter = ShopifyRateLimiter(limit=1000, leak_rate=50)
+        self._lock = threading.Lock()
+        # Decode/pad/encode is CPU-bound; during run() it is spread over a process pool,
+        # forked on the first resize so runs with nothing to resize never start one
+        self._encode_pool = None
+        self._pool_encodes = False
         
-        # Create folders for images
-        os.makedirs('images/original', exist_ok=True)
-        os.makedirs('images/resized', exist_ok=True)
+        # Images are resized in memory; disk copies are only kept when archiving
+        self.save_originals = save_originals
+        # Resized canvases are mostly transparent padding, so encoder settings decide the upload size
+        self.output_ext = 'webp' if webp else 'png'
+        if save_originals:
+            os.makedirs('images/original', exist_ok=True)
+            os.makedirs('images/resized', exist_ok=True)
         
         self.processed_count = 0
         self.resized_count = 0
@@ -35,120 +177,275 @@ class ShopifyImageResizer:
         
     def get_all_products(self) -> List[Dict[str, Any]]:
         """Fetch all products from Shopify store"""
+        return list(self.iter_all_products())
+    
+    def iter_all_products(self) -> Iterator[Dict[str, Any]]:
+        """Yield every product in the store, page by page, without holding the whole catalog"""
         print("🔍 Fetching all products from Shopify...")
         
-        all_products = []
-        page_info = None
+        self.total_products = 0
         page = 1
         
-        while True:
-            # Use REST API with limit and page_info for pagination
-            url = f"{self.shop_url}/admin/api/{self.api_version}/products.json?limit=50&fields=id,title,images,handle,product_type"
+        # Use REST API with limit and page_info for pagination
+        base_url = f"{self.shop_url}/admin/api/{self.api_version}/products.json?limit=50&fields=id,title,images,handle,product_type"
+        
+        # The next cursor is in the headers, so the next page is requested on a background
+        # thread while this page's body is still downloading and being parsed
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            pending = prefetcher.submit(self._request_page, base_url)
             
-            if page_info:
-                url += f"&page_info={page_info}"
-                
-            try:
-                response = requests.get(url, headers=self.headers)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    products = data.get('products', [])
-                    all_products.extend(products)
-                    
-                    print(f"   📄 Page {page}: {len(products)} products")
+            while pending:
+                try:
+                    response = pending.result()
+                    pending = None
                     
-                    # Check for next page
-                    link_header = response.headers.get('Link', '')
-                    if 'next' in link_header:
-                        # Extract page_info from Link header
-                        import re
-                        next_match = re.search(r'<[^>]*[?&]page_info=([^&>]*)>', link_header)
+                    if response.status_code == 200:
+                        # Check for next page
+                        link_header = response.headers.get('Link', '')
+                        next_match = _NEXT_LINK_RE.search(link_header) if 'rel="next"' in link_header else None
                         if next_match:
-                            page_info = next_match.group(1)
-                            page += 1
+                            # Extract page_info from the next link
+                            page_info = parse_qs(urlparse(next_match.group(1)).query).get('page_info')
+                            if page_info:
+                                pending = prefetcher.submit(self._request_page, f"{base_url}&page_info={page_info[0]}")
+                        
+                        if ijson is not None:
+                            response.raw.decode_content = True
+                            products = ijson.items(response.raw, 'products.item', use_float=True)
                         else:
-                            break
+                            products = response.json().get('products', [])
+                        
+                        count = 0
+                        for product in products:
+                            count += 1
+                            self.total_products += 1
+                            yield product
+                        
+                        print(f"   📄 Page {page}: {count} products")
+                        page += 1
                     else:
-                        break
-                else:
-                    print(f"❌ Error fetching products: {response.status_code}")
-                    print(f"Response: {response.text}")
+                        print(f"❌ Error fetching products: {response.status_code}")
+                        print(f"Response: {response.text}")
+                        
+                except Exception as e:
+                    print(f"❌ Exception fetching products: {e}")
                     break
-                    
-            except Exception as e:
-                print(f"❌ Exception fetching products: {e}")
-                break
         
-        self.total_products = len(all_products)
         print(f"✅ Found {self.total_products} total products")
-        return all_products
     
-    def download_image(self, image_url: str, filename: str) -> Tuple[bool, int, int]:
-        """Download image and return success status with dimensions"""
+    def _rest(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Admin REST call paced by the shared limiter, which learns the bucket level from the reply"""
+        self.rate_limiter.wait()
+        response = self.session.request(method, url, headers=self.headers, **kwargs)
+        self.rate_limiter.update_from_headers(response)
+        return response
+    
+    def _request_page(self, url: str) -> requests.Response:
+        """Products page request; returns once headers arrive, the body is read by the caller"""
+        return self._rest('GET', url, stream=True)
+    
+    def download_image(self, image_url: str, filename: str) -> Tuple[bool, Optional[bytes], int, int]:
+        """Download image and return success status with the raw image bytes and dimensions"""
         try:
-            response = requests.get(image_url, timeout=30)
+            response = self.session.get(image_url, timeout=30)
             if response.status_code == 200:
-                # Save original image
-                original_path = f"images/original/{filename}"
-                with open(original_path, 'wb') as f:
-                    f.write(response.content)
+                # Archive original image if asked to
+                if self.save_originals:
+                    with open(f"images/original/{filename}", 'wb') as f:
+                        f.write(response.content)
                 
-                # Get dimensions
-                image = Image.open(BytesIO(response.content))
-                width, height = image.size
+                # Dimensions come from the header; pixels are only decoded if a resize is needed
+                width, height = Image.open(BytesIO(response.content)).size
                 
-                return True, width, height
+                return True, response.content, width, height
             else:
                 print(f"   ❌ Failed to download image: {response.status_code}")
-                return False, 0, 0
+                return False, None, 0, 0
                 
         except Exception as e:
             print(f"   ❌ Error downloading image: {e}")
-            return False, 0, 0
+            return False, None, 0, 0
     
-    def resize_image_canvas(self, original_path: str, resized_path: str, target_width: int = 750) -> bool:
-        """Resize image canvas to target width with transparent background (like sips command)"""
+    def probe_image_dimensions(self, image_url: str, max_bytes: int = 4096) -> Optional[Tuple[int, int]]:
+        """(width, height) parsed from the start of an image, or None if the header wasn't in range"""
         try:
-            # Open original image
-            image = Image.open(original_path)
-            original_width, original_height = image.size
+            # Servers that ignore Range still only get read up to max_bytes
+            headers = {'Range': f'bytes=0-{max_bytes - 1}'}
+            with self.session.get(image_url, headers=headers, stream=True, timeout=30) as response:
+                if response.status_code not in (200, 206):
+                    return None
+                
+                parser = ImageFile.Parser()
+                read = 0
+                for chunk in response.iter_content(1024):
+                    parser.feed(chunk)
+                    if parser.image:
+                        return parser.image.size
+                    read += len(chunk)
+                    if read >= max_bytes:
+                        break
+        except Exception:
+            pass
+        return None
+    
+    def _encoder(self):
+        """run()'s encode pool, started on first use; None outside run(), where encodes stay in-process"""
+        if not self._pool_encodes:
+            return None
+        with self._lock:
+            if self._encode_pool is None:
+                # Started from a worker thread, so fork (which would copy other threads' held locks) is avoided
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._encode_pool = multiprocessing.get_context(method).Pool(os.cpu_count())
+            return self._encode_pool
+    
+    def resize_image_canvas(self, raw_image: bytes, target_width: int = 750) -> Optional[bytes]:
+        """Resize image canvas to target width with transparent background (like sips command); returns encoded bytes"""
+        try:
+            original_width, original_height = Image.open(BytesIO(raw_image)).size
             
             # If image already meets width requirement, no need to resize
             if original_width >= 400:
                 print(f"   ✅ Image width ({original_width}px) already sufficient, skipping resize")
-                return False
-            
-            # Create new canvas with target width, keeping original height
-            new_image = Image.new('RGBA', (target_width, original_height), (0, 0, 0, 0))
+                return None
             
-            # Center the original image on the new canvas
-            x_offset = (target_width - original_width) // 2
-            new_image.paste(image, (x_offset, 0))
-            
-            # Save resized image
-            new_image.save(resized_path, 'PNG')
+            # Worker threads hand the encode to the process pool, so it isn't bound to one core
+            args = (raw_image, target_width, self.output_ext)
+            pool = self._encoder()
+            if pool is not None:
+                encoded = pool.apply(_encode_canvas, args)
+            else:
+                encoded = _encode_canvas(*args)
             print(f"   ✅ Resized: {original_width}x{original_height} → {target_width}x{original_height}")
             
-            return True
+            return encoded
             
         except Exception as e:
             print(f"   ❌ Error resizing image: {e}")
+            return None
+    
+    def _graphql(self, query: str, variables: Dict[str, Any], cost: float = 10, attempts: int = 5) -> Dict[str, Any]:
+        """Run an Admin GraphQL call and return its data, or {} on failure; THROTTLED replies are waited out and resent"""
+        url = f"{self.shop_url}/admin/api/{self.api_version}/graphql.json"
+        for attempt in range(attempts):
+            # Reserve the query's points, not one call, so the threads together stay under the 1000-point bucket
+            self.graphql_limiter.wait(cost)
+            response = self.session.post(url, headers=self.headers, json={"query": query, "variables": variables})
+            if response.status_code != 200:
+                print(f"   ❌ GraphQL request failed: {response.status_code}")
+                return {}
+            data = response.json()
+            query_cost = data.get('extensions', {}).get('cost', {})
+            throttle = query_cost.get('throttleStatus')
+            if throttle:
+                self.graphql_limiter.update(throttle['maximumAvailable'] - throttle['currentlyAvailable'],
+                                            throttle['maximumAvailable'], throttle['restoreRate'])
+            
+            errors = data.get('errors')
+            # Throttling is a 200 with data: null - Shopify ran nothing, so the call is safe to resend
+            if not errors or not any((e.get('extensions') or {}).get('code') == 'THROTTLED' for e in errors):
+                if errors:
+                    print(f"   ❌ GraphQL errors: {errors}")
+                return data.get('data') or {}
+            # The limiter now holds Shopify's bucket level, so the next wait() sleeps until it has drained;
+            # without a throttleStatus there is nothing to sync, so back off for the query's restore time
+            if not throttle and attempt < attempts - 1:
+                time.sleep(query_cost.get('requestedQueryCost', cost) / self.graphql_limiter.leak_rate + 1)
+        
+        print(f"   ❌ GraphQL still throttled after {attempts} attempts")
+        return {}
+    
+    def _staged_upload(self, filename: str, content_type: str, image_data: bytes) -> Optional[str]:
+        """Upload raw image bytes to a staged target and return its resourceUrl, or None"""
+        result = self._graphql(_STAGED_UPLOADS_CREATE, {"input": [{
+            "filename": filename,
+            "mimeType": content_type,
+            "resource": "IMAGE",
+            "httpMethod": "POST",
+            "fileSize": str(len(image_data))
+        }]})
+        targets = (result.get('stagedUploadsCreate') or {}).get('stagedTargets') or []
+        if not targets:
+            return None
+        
+        # The target is cloud storage, not the Admin API: no access token and no API rate limit
+        target = targets[0]
+        fields = {param['name']: param['value'] for param in target['parameters']}
+        response = self.session.post(target['url'], data=fields, files={'file': (filename, image_data, content_type)}, timeout=60)
+        if response.status_code not in (200, 201, 204):
+            print(f"   ⚠️ Staged upload failed: {response.status_code}")
+            return None
+        return target['resourceUrl']
+    
+    def _attach_staged_image(self, product_id: str, resource_url: str, original_image_id: str = None, position: int = None) -> bool:
+        """Attach a staged upload as product media, taking the replaced image's place if given"""
+        product_gid = f"gid://shopify/Product/{product_id}"
+        result = self._graphql(_PRODUCT_CREATE_MEDIA, {
+            "productId": product_gid,
+            "media": [{"originalSource": resource_url, "mediaContentType": "IMAGE"}]
+        })
+        payload = result.get('productCreateMedia') or {}
+        media = payload.get('media') or []
+        if not media or payload.get('mediaUserErrors'):
+            print(f"   ❌ Failed to attach image: {payload.get('mediaUserErrors')}")
             return False
+        
+        if original_image_id:
+            # The original is only removed once the new media is usable, so a failed upload never leaves the product bare
+            if not self._wait_for_media(media[0]):
+                return False
+            
+            # Remove the image being replaced and move the new one into its slot
+            url = f"{self.shop_url}/admin/api/{self.api_version}/products/{product_id}/images/{original_image_id}.json"
+            response = self._rest('DELETE', url)
+            if response.status_code != 200:
+                print(f"   ❌ Failed to remove original image: {response.status_code}")
+                return False
+            if position:
+                result = self._graphql(_PRODUCT_REORDER_MEDIA, {
+                    "id": product_gid,
+                    "moves": [{"id": media[0]['id'], "newPosition": str(position - 1)}]
+                })
+                payload = result.get('productReorderMedia')
+                if payload is None or payload.get('userErrors'):
+                    print(f"   ❌ Failed to move image into position {position}: {(payload or {}).get('userErrors')}")
+                    return False
+        
+        print(f"   ✅ Image uploaded to Shopify successfully")
+        return True
     
-    def upload_image_to_shopify(self, product_id: str, image_path: str, original_image_id: str = None) -> bool:
+    def _wait_for_media(self, media: Dict[str, Any], timeout: float = 60) -> bool:
+        """Poll new product media until Shopify has processed it; True once READY, False if FAILED or timed out"""
+        status = media.get('status')
+        deadline = time.monotonic() + timeout
+        while status != 'READY':
+            if status == 'FAILED':
+                print(f"   ❌ Shopify could not process the new image")
+                return False
+            if time.monotonic() >= deadline:
+                print(f"   ❌ New image still {status} after {timeout:.0f}s")
+                return False
+            time.sleep(1)
+            node = self._graphql(_MEDIA_STATUS, {"id": media['id']}, cost=1).get('node') or {}
+            status = node.get('status')
+            if node.get('mediaErrors'):
+                print(f"   ⚠️ Media errors: {node['mediaErrors']}")
+        return True
+    
+    def upload_image_to_shopify(self, product_id: str, image_data: bytes, filename: str, original_image_id: str = None,
+                                position: int = None) -> bool:
         """Upload resized image to Shopify product and replace original if specified"""
         try:
-            # Read the resized image
-            with open(image_path, 'rb') as f:
-                image_data = f.read()
+            # Raw bytes via a staged upload; no base64 blow-up and no JSON-embedded payload
+            content_type = 'image/webp' if filename.endswith('.webp') else 'image/png'
+            resource_url = self._staged_upload(filename, content_type, image_data)
+            if resource_url:
+                return self._attach_staged_image(product_id, resource_url, original_image_id, position)
             
-            # Convert to base64 for Shopify API
+            # Fall back to a base64 attachment when staging isn't available
             import base64
             image_b64 = base64.b64encode(image_data).decode('utf-8')
             
-            filename = os.path.basename(image_path)
-            
             # If we're replacing an existing image
             if original_image_id:
                 # Update existing image
@@ -160,7 +457,7 @@ class ShopifyImageResizer:
                     }
                 }
                 
-                response = requests.put(url, headers=self.headers, json=image_data_obj)
+                response = self._rest('PUT', url, json=image_data_obj)
             else:
                 # Add new image
                 url = f"{self.shop_url}/admin/api/{self.api_version}/products/{product_id}/images.json"
@@ -171,7 +468,7 @@ class ShopifyImageResizer:
                     }
                 }
                 
-                response = requests.post(url, headers=self.headers, json=image_data_obj)
+                response = self._rest('POST', url, json=image_data_obj)
             
             if response.status_code in [200, 201]:
                 print(f"   ✅ Image uploaded to Shopify successfully")
@@ -207,11 +504,22 @@ class ShopifyImageResizer:
             
             # Generate filename
             filename = f"{product_id}_{image_id}.png"
-            original_path = f"images/original/{filename}"
-            resized_path = f"images/resized/{filename}"
+            resized_filename = f"{product_id}_{image_id}.{self.output_ext}"
+            
+            # Shopify already reports image dimensions; wide-enough images need no download.
+            # Without them, the image header in the first few KB is enough to tell
+            if not self.save_originals:
+                if image.get('width'):
+                    known_size = image['width'], image.get('height')
+                else:
+                    known_size = self.probe_image_dimensions(image_url)
+                if known_size and known_size[0] >= 400:
+                    print(f"   📏 Original size: {known_size[0]}x{known_size[1]}px")
+                    print(f"   ✅ Width sufficient ({known_size[0]}px), no resize needed")
+                    continue
             
             # Download image
-            success, width, height = self.download_image(image_url, filename)
+            success, original, width, height = self.download_image(image_url, filename)
             
             if not success:
                 continue
@@ -223,12 +531,18 @@ class ShopifyImageResizer:
                 print(f"   🔧 Width < 400px, resizing canvas to 750px...")
                 
                 # Resize the image canvas
-                if self.resize_image_canvas(original_path, resized_path, 750):
-                    self.resized_count += 1
+                resized = self.resize_image_canvas(original, 750)
+                if resized:
+                    with self._lock:
+                        self.resized_count += 1
+                    
+                    if self.save_originals:
+                        with open(f"images/resized/{resized_filename}", 'wb') as f:
+                            f.write(resized)
                     
                     # Upload resized image back to Shopify
                     print(f"   ⬆️ Uploading resized image...")
-                    if self.upload_image_to_shopify(product_id, resized_path, image_id):
+                    if self.upload_image_to_shopify(product_id, resized, resized_filename, image_id, image.get('position')):
                         print(f"   ✅ Successfully replaced image in Shopify")
                     else:
                         print(f"   ❌ Failed to upload resized image")
@@ -236,23 +550,38 @@ class ShopifyImageResizer:
                     print(f"   ❌ Failed to resize image")
             else:
                 print(f"   ✅ Width sufficient ({width}px), no resize needed")
-            
-            # Small delay to avoid rate limiting
-            time.sleep(0.5)
         
-        self.processed_count += 1
-        print(f"   📊 Progress: {self.processed_count}/{self.total_products} products")
+        with self._lock:
+            self.processed_count += 1
+            processed = self.processed_count
+        print(f"   📊 Progress: {processed}/{self.total_products} products")
     
-    def filter_wine_products(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _process_product_safely(self, product: Dict[str, Any]) -> None:
+        try:
+            self.process_product_images(product)
+        except Exception as e:
+            print(f"❌ Error processing product {product.get('title', 'Unknown')}: {e}")
+    
+    def filter_wine_products(self, products: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
         """Filter products to only include wine-related items"""
-        wine_products = []
+        return (product for product in products if 'wine' in product.get('product_type', '').lower())
+    
+    def _process_all(self, executor: ThreadPoolExecutor, products: Iterable[Dict[str, Any]]) -> int:
+        """Feed products to the pool as they stream in, keeping only a few queued at a time"""
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
         
-        for product in products:
-            product_type = product.get('product_type', '').lower()
-            if 'wine' in product_type:
-                wine_products.append(product)
+        def task(product: Dict[str, Any]) -> None:
+            try:
+                self._process_product_safely(product)
+            finally:
+                slots.release()
         
-        return wine_products
+        submitted = 0
+        for product in products:
+            slots.acquire()
+            executor.submit(task, product)
+            submitted += 1
+        return submitted
     
     def run(self, test_mode=False, test_limit=5, wine_only=False):
         """Main execution function"""
@@ -269,36 +598,42 @@ class ShopifyImageResizer:
         
         print()
         
-        # Get all products
-        products = self.get_all_products()
-        
-        if not products:
-            print("❌ No products found!")
-            return
+        # Stream products; each page is processed while the next one downloads
+        products = self.iter_all_products()
         
         # Filter for wine products if requested
         if wine_only:
-            original_count = len(products)
             products = self.filter_wine_products(products)
-            print(f"🍷 Filtered to {len(products)} wine products (from {original_count} total)")
         
         # Limit products for test mode
         if test_mode:
-            products = products[:test_limit]
-            print(f"🧪 Limited to {len(products)} products for testing")
+            products = islice(products, test_limit)
         
-        print(f"\n🚀 Starting image processing for {len(products)} products...")
+        print(f"\n🚀 Starting image processing...")
         
-        # Process each product
-        for product in products:
-            try:
-                self.process_product_images(product)
-            except KeyboardInterrupt:
-                print("\n⚠️ Process interrupted by user")
-                break
-            except Exception as e:
-                print(f"❌ Error processing product {product.get('title', 'Unknown')}: {e}")
-                continue
+        # Process products in parallel - downloads and uploads are network-bound
+        submitted = 0
+        self._pool_encodes = True
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            submitted = self._process_all(executor, products)
+            # Let the products still queued behind the semaphore finish
+            executor.shutdown(wait=True)
+        except KeyboardInterrupt:
+            print("\n⚠️ Process interrupted by user")
+            executor.shutdown(cancel_futures=True)
+        finally:
+            self._pool_encodes = False
+            if self._encode_pool is not None:
+                self._encode_pool.terminate()
+                self._encode_pool = None
+        
+        if not self.total_products:
+            print("❌ No products found!")
+            return
+        
+        if wine_only:
+            print(f"🍷 Filtered to {submitted} wine products (from {self.total_products} total)")
         
         # Final summary
         print("\n" + "=" * 50)
@@ -306,8 +641,9 @@ class ShopifyImageResizer:
         print("=" * 50)
         print(f"✅ Products processed: {self.processed_count}/{self.total_products}")
         print(f"🔧 Images resized: {self.resized_count}")
-        print(f"📁 Original images saved to: images/original/")
-        print(f"📁 Resized images saved to: images/resized/")
+        if self.save_originals:
+            print(f"📁 Original images saved to: images/original/")
+            print(f"📁 Resized images saved to: images/resized/")
         
         if self.resized_count > 0:
             print(f"\n✅ Successfully processed {self.resized_count} images!")
@@ -322,9 +658,11 @@ def main():
     args = [arg.lower() for arg in sys.argv[1:]]
     test_mode = 'test' in args
     wine_only = 'wine' in args or 'wines' in args
+    save_originals = '--save-originals' in args
+    webp = 'webp' in args
     
     try:
-        resizer = ShopifyImageResizer()
+        resizer = ShopifyImageResizer(save_originals=save_originals, webp=webp)
         resizer.run(test_mode=test_mode, wine_only=wine_only)
     except KeyboardInterrupt:
         print("\n⚠️ Process interrupted by user")
@@ -4,19 +4,69 @@ Generic Shopify Product Importer
 Works with any product type - just provide CSV and product config
 """
 
+import asyncio
 import csv
-import json
-import requests
-import time
+import httpx
+import importlib.util
 import argparse
 import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from shopify_api import (
+    BULK_MIN_PRODUCTS, BULK_OPERATION_RUN_MUTATION, BULK_PRODUCT_SET, BULK_UPLOAD_INPUT, CURRENT_BULK_OPERATION,
+    GRAPHQL_BUCKET, METAFIELDS_PER_CALL, METAFIELDS_SET, METAFIELDS_SET_COST, REST_BUCKET, STAGED_UPLOADS_CREATE,
+    TokenBucket, bulk_jsonl, bulk_poll_delays, bulk_result_url, bulk_settled, bulk_staged_target, bulk_submitted,
+    count_bulk_results, graphql_data, json_dumps, json_loads, retry_delay, track_graphql_cost,
+)
 
+# HTTP/2 multiplexes every in-flight product's calls over one connection; it needs the h2 package (httpx[http2])
+_HTTP2 = importlib.util.find_spec('h2') is not None
+
+_PRODUCT_CREATE_COST = 10
+_PRODUCT_SET_COST = 10
+# Top-level error codes meaning this API version/app can't run productSet at all
+_PRODUCT_SET_UNAVAILABLE = frozenset({'undefinedField', 'undefinedType', 'argumentNotAccepted', 'ACCESS_DENIED'})
+
+_VARIANTS_BULK_UPDATE = """
+mutation productVariantsBulkUpdate($productId: ID!, $variants: [ProductVariantsBulkInput!]!) {
+    productVariantsBulkUpdate(productId: $productId, variants: $variants) {
+        userErrors {
+            field
+            message
+        }
+    }
+}
+"""
+_VARIANTS_BULK_UPDATE_COST = 10
+
+# Failures that happen before the request reaches Shopify - the only ones a create can safely resend after
+_UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+async def with_retry(send, bucket: TokenBucket = REST_BUCKET, cost: float = 1, max_attempts: int = 8,
+                     idempotent: bool = True) -> httpx.Response:
+    """Await send() until Shopify stops throttling or erroring, backing off as retry_delay says (see there for idempotent)"""
+    for attempt in range(max_attempts):
+        last_attempt = attempt == max_attempts - 1
+        wait = bucket.reserve(cost)
+        if wait:
+            await asyncio.sleep(wait)
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            if last_attempt or not (idempotent or isinstance(e, _UNSENT_ERRORS)):
+                raise
+            response = None
+        
+        delay = retry_delay(response, attempt, bucket, idempotent)
+        if delay is None or last_attempt:
+            return response
+        await asyncio.sleep(delay)
+
+@lru_cache(maxsize=1)
 def load_shopify_credentials():
     """Load Shopify credentials from config"""
     try:
-        import importlib.util
         config_path = Path(__file__).parent / 'config.py'
         spec = importlib.util.spec_from_file_location("config", config_path)
         config = importlib.util.module_from_spec(spec)
@@ -26,18 +76,120 @@ def load_shopify_credentials():
         print(f"❌ Could not load config.py: {e}")
         return None, None
 
+@lru_cache(maxsize=8)
 def load_product_config(product_type: str) -> Dict:
     """Load product configuration"""
     try:
-        import yaml
-        config_path = Path(__file__).parent / 'config' / 'products' / f'{product_type}.yaml'
-        with open(config_path) as f:
-            return yaml.safe_load(f)
+        from config.config_manager import load_product_config as load_config
+        return load_config(product_type)
     except:
         return {'extra_fields': []}
 
-def create_product(shop_url: str, access_token: str, product_data: Dict, extra_fields: List[str]) -> bool:
-    """Create product in Shopify with GraphQL"""
+def coerce_row(row: Dict) -> Optional[Dict]:
+    """CSV row with strings stripped, price as a float and msrp as a float or None; None if price is malformed"""
+    product_data = {key: value.strip() if isinstance(value, str) else value for key, value in row.items()}
+    try:
+        product_data['price'] = float(product_data.get('price') or 0)
+    except ValueError:
+        return None
+    try:
+        product_data['msrp'] = float(product_data['msrp']) if product_data.get('msrp') else None
+    except ValueError:
+        product_data['msrp'] = None
+    return product_data
+
+def product_set_input(product_data: Dict, extra_fields: List[str]) -> Dict:
+    """ProductSetInput carrying the product, its priced variant, image and extra-field metafields"""
+    variant = {
+        "optionValues": [{"optionName": "Title", "name": "Default Title"}],
+        "sku": product_data.get('sku', ''),
+        **variant_pricing(product_data),
+    }
+    
+    namespace = product_data.get('_product_type', 'generic')
+    product_input = {
+        "title": product_data.get('title', ''),
+        "vendor": product_data.get('brand', ''),
+        "productType": product_data.get('collection', ''),
+        "descriptionHtml": product_data.get('description', ''),
+        "tags": [product_data.get('collection', '')],
+        "status": "ACTIVE",
+        "productOptions": [{"name": "Title", "values": [{"name": "Default Title"}]}],
+        "variants": [variant],
+        "metafields": [
+            {"namespace": namespace, "key": field_name, "value": str(product_data[field_name]), "type": "single_line_text_field"}
+            for field_name in extra_fields if product_data.get(field_name)
+        ],
+    }
+    
+    image_url = product_data.get('image_url') or ''
+    if image_url.startswith('http'):
+        product_input["files"] = [{"originalSource": image_url, "contentType": "IMAGE"}]
+    return product_input
+
+def variant_pricing(product_data: Dict) -> Dict:
+    """price, plus compareAtPrice when there is a positive msrp, for a variant input (fields from coerce_row)"""
+    pricing = {"price": str(product_data['price'])}
+    if product_data.get('msrp') and product_data['msrp'] > 0:
+        pricing["compareAtPrice"] = str(product_data['msrp'])
+    return pricing
+
+async def create_product(client: httpx.AsyncClient, product_data: Dict, extra_fields: List[str]) -> bool:
+    """Create product, price, image and metafields in Shopify with one productSet mutation"""
+    
+    mutation = """
+    mutation productSet($input: ProductSetInput!) {
+        productSet(synchronous: true, input: $input) {
+            product {
+                id
+            }
+            userErrors {
+                field
+                message
+            }
+        }
+    }
+    """
+    
+    product_input = product_set_input(product_data, extra_fields)
+    
+    url = "/admin/api/2025-07/graphql.json"
+    response = await with_retry(lambda: client.post(url, content=json_dumps({"query": mutation, "variables": {"input": product_input}})),
+                                bucket=GRAPHQL_BUCKET, cost=_PRODUCT_SET_COST, idempotent=False)
+    
+    if response.status_code != 200:
+        print(f"  ❌ HTTP {response.status_code}: {response.text[:200]}")
+        return False
+    
+    result = json_loads(response.content)
+    track_graphql_cost(result)
+    
+    # Schema or access errors mean this shop/app can't run productSet - use the call-per-step path instead;
+    # anything else (still THROTTLED after every retry, bad input) would fail the same way there
+    if 'errors' in result:
+        if any((e.get('extensions') or {}).get('code') in _PRODUCT_SET_UNAVAILABLE for e in result['errors']):
+            print(f"  ⚠️  productSet unavailable, falling back: {result['errors']}")
+            return await create_product_stepwise(client, product_data, extra_fields)
+        print(f"  ❌ Failed: {product_data['title']}")
+        print(f"     Errors: {result['errors']}")
+        return False
+    
+    payload = result['data']['productSet']
+    if payload.get('product'):
+        print(f"  ✅ Created: {product_data['title']}")
+        return True
+    
+    errors = payload.get('userErrors', [])
+    if any('already' in e.get('message', '').lower() for e in errors):
+        print(f"  ⏭️  Already exists: {product_data['title']}")
+        return True
+    
+    print(f"  ❌ Failed: {product_data['title']}")
+    print(f"     Errors: {errors}")
+    return False
+
+async def create_product_stepwise(client: httpx.AsyncClient, product_data: Dict, extra_fields: List[str]) -> bool:
+    """Create product in Shopify with GraphQL, then price, image and metafields as separate calls"""
     
     mutation = """
     mutation productCreate($input: ProductInput!) {
@@ -73,19 +225,17 @@ def create_product(shop_url: str, access_token: str, product_data: Dict, extra_f
         }
     }
     
-    # Note: Variants are created automatically with product
-    # We'll update pricing via REST API after product creation
-    
-    url = f"{shop_url}/admin/api/2025-07/graphql.json"
-    headers = {
-        'X-Shopify-Access-Token': access_token,
-        'Content-Type': 'application/json'
-    }
+    # 2025-07 productCreate takes no variants: the default one it creates is priced by a
+    # follow-up GraphQL call on the same connection (productSet above does it all inline)
     
-    response = requests.post(url, headers=headers, json={"query": mutation, "variables": variables})
+    url = "/admin/api/2025-07/graphql.json"
+    response = await with_retry(lambda: client.post(url, content=json_dumps({"query": mutation, "variables": variables})),
+                                bucket=GRAPHQL_BUCKET, cost=_PRODUCT_CREATE_COST, idempotent=False)
     
     if response.status_code == 200:
-        result = response.json()
+        result = json_loads(response.content)
+        
+        track_graphql_cost(result)
         
         # Check for GraphQL errors
         if 'errors' in result:
@@ -99,20 +249,20 @@ def create_product(shop_url: str, access_token: str, product_data: Dict, extra_f
             # Get variant ID
             variant_id = None
             if product.get('variants', {}).get('edges'):
-                variant_id = product['variants']['edges'][0]['node']['id'].split('/')[-1]
+                variant_id = product['variants']['edges'][0]['node']['id']
             
             print(f"  ✅ Created: {product_data['title']}")
             
             # Update variant pricing
             if variant_id:
-                update_variant_pricing(shop_url, access_token, variant_id, product_data)
+                await update_variant_pricing(client, product['id'], variant_id, product_data)
             
             # Add image
             if product_data.get('image_url'):
-                add_product_image(shop_url, access_token, product_id, product_data['image_url'])
+                await add_product_image(client, product_id, product_data['image_url'])
             
             # Add metafields for extra fields
-            add_metafields(shop_url, access_token, product_id, product_data, extra_fields, product_data.get('_product_type', 'generic'))
+            await add_metafields(client, product_id, product_data, extra_fields, product_data.get('_product_type', 'generic'))
             
             return True
         else:
@@ -129,85 +279,177 @@ def create_product(shop_url: str, access_token: str, product_data: Dict, extra_f
         print(f"  ❌ HTTP {response.status_code}: {response.text[:200]}")
         return False
 
-def update_variant_pricing(shop_url: str, access_token: str, variant_id: str, product_data: Dict):
-    """Update variant pricing via REST API"""
+async def update_variant_pricing(client: httpx.AsyncClient, product_id: str, variant_id: str, product_data: Dict):
+    """Set the default variant's price and SKU with productVariantsBulkUpdate"""
     
-    url = f"{shop_url}/admin/api/2025-07/variants/{variant_id}.json"
-    headers = {
-        'X-Shopify-Access-Token': access_token,
-        'Content-Type': 'application/json'
+    variables = {
+        "productId": product_id,
+        "variants": [{"id": variant_id, "inventoryItem": {"sku": product_data.get('sku', '')}, **variant_pricing(product_data)}],
     }
     
-    variant_update = {
-        "variant": {
-            "id": int(variant_id),
-            "price": str(product_data.get('price', 0)),
-            "sku": product_data.get('sku', ''),
-        }
-    }
+    url = "/admin/api/2025-07/graphql.json"
+    try:
+        response = await with_retry(lambda: client.post(url, content=json_dumps({"query": _VARIANTS_BULK_UPDATE, "variables": variables}), timeout=10),
+                                    bucket=GRAPHQL_BUCKET, cost=_VARIANTS_BULK_UPDATE_COST)
+    except httpx.HTTPError as e:
+        print(f"  ⚠️  Price update failed: {e}")
+        return
     
-    # Add compare at price if exists
-    if product_data.get('msrp'):
-        try:
-            msrp = float(product_data['msrp'])
-            if msrp > 0:
-                variant_update["variant"]["compare_at_price"] = str(msrp)
-        except:
-            pass
+    if response.status_code != 200:
+        print(f"  ⚠️  Price update failed: HTTP {response.status_code}")
+        return
     
-    try:
-        requests.put(url, headers=headers, json=variant_update, timeout=10)
-        time.sleep(0.3)
-    except:
-        pass
+    result = json_loads(response.content)
+    track_graphql_cost(result)
+    errors = result.get('errors') or (result.get('data') or {}).get('productVariantsBulkUpdate', {}).get('userErrors')
+    if errors:
+        print(f"  ⚠️  Price update failed: {errors}")
 
-def add_product_image(shop_url: str, access_token: str, product_id: str, image_url: str):
+async def add_product_image(client: httpx.AsyncClient, product_id: str, image_url: str):
     """Add image to product"""
     if not image_url or not image_url.startswith('http'):
         return
     
-    url = f"{shop_url}/admin/api/2025-07/products/{product_id}/images.json"
-    headers = {
-        'X-Shopify-Access-Token': access_token,
-        'Content-Type': 'application/json'
-    }
+    url = f"/admin/api/2025-07/products/{product_id}/images.json"
     
     data = {"image": {"src": image_url}}
     
     try:
-        requests.post(url, headers=headers, json=data, timeout=10)
-        time.sleep(0.3)
-    except:
-        pass
+        response = await with_retry(lambda: client.post(url, content=json_dumps(data), timeout=10), idempotent=False)
+        if response.status_code not in (200, 201):
+            print(f"  ⚠️  Image failed: HTTP {response.status_code}")
+    except httpx.HTTPError as e:
+        print(f"  ⚠️  Image failed: {e}")
 
-def add_metafields(shop_url: str, access_token: str, product_id: str, product_data: Dict, extra_fields: List[str], namespace: str):
+async def add_metafields(client: httpx.AsyncClient, product_id: str, product_data: Dict, extra_fields: List[str], namespace: str):
     """Add metafields for extra product data"""
     
-    url = f"{shop_url}/admin/api/2025-07/products/{product_id}/metafields.json"
-    headers = {
-        'X-Shopify-Access-Token': access_token,
-        'Content-Type': 'application/json'
-    }
+    url = "/admin/api/2025-07/graphql.json"
+    owner_id = f"gid://shopify/Product/{product_id}"
     
-    for field_name in extra_fields:
-        value = product_data.get(field_name, '')
-        if value:
-            data = {
-                "metafield": {
-                    "namespace": namespace,
-                    "key": field_name,
-                    "value": str(value),
-                    "type": "single_line_text_field"
-                }
-            }
-            
-            try:
-                requests.post(url, headers=headers, json=data, timeout=10)
-                time.sleep(0.3)
-            except:
-                pass
+    inputs = [
+        {
+            "ownerId": owner_id,
+            "namespace": namespace,
+            "key": field_name,
+            "value": str(product_data[field_name]),
+            "type": "single_line_text_field"
+        }
+        for field_name in extra_fields if product_data.get(field_name)
+    ]
+    
+    # One mutation per 25 fields instead of one REST call per field
+    for start in range(0, len(inputs), METAFIELDS_PER_CALL):
+        batch = {"query": METAFIELDS_SET, "variables": {"metafields": inputs[start:start + METAFIELDS_PER_CALL]}}
+        try:
+            response = await with_retry(lambda: client.post(url, content=json_dumps(batch), timeout=10),
+                                        bucket=GRAPHQL_BUCKET, cost=METAFIELDS_SET_COST)
+        except httpx.HTTPError as e:
+            print(f"  ⚠️  Metafields failed: {e}")
+            continue
+        
+        if response.status_code != 200:
+            print(f"  ⚠️  Metafields failed: HTTP {response.status_code}")
+            continue
+        
+        result = json_loads(response.content)
+        track_graphql_cost(result)
+        errors = result.get('errors') or (result.get('data') or {}).get('metafieldsSet', {}).get('userErrors')
+        if errors:
+            print(f"  ⚠️  Metafields failed: {errors}")
 
-def import_products(csv_file: str, product_type: str):
+async def graphql(client: httpx.AsyncClient, query: str, variables: Dict = None, cost: float = 10, idempotent: bool = True) -> Dict:
+    """data of a GraphQL call, metered through GRAPHQL_BUCKET; raises on HTTP or top-level GraphQL errors"""
+    body = json_dumps({"query": query, "variables": variables or {}})
+    response = await with_retry(lambda: client.post("/admin/api/2025-07/graphql.json", content=body),
+                                bucket=GRAPHQL_BUCKET, cost=cost, idempotent=idempotent)
+    response.raise_for_status()
+    return graphql_data(json_loads(response.content))
+
+async def bulk_import(client: httpx.AsyncClient, products: List[Dict], extra_fields: List[str]) -> Optional[int]:
+    """Create every product server-side with one bulkOperationRunMutation; how many were created, or None if it couldn't be submitted"""
+    
+    jsonl = bulk_jsonl(product_set_input(p, extra_fields) for p in products)
+    
+    try:
+        url, fields = bulk_staged_target(await graphql(client, STAGED_UPLOADS_CREATE, BULK_UPLOAD_INPUT))
+        
+        # The target is cloud storage, not the Admin API: a bare client, so the access token isn't sent there
+        async with httpx.AsyncClient(timeout=300.0) as storage:
+            response = await storage.post(url, data=fields, files={'file': ('products.jsonl', jsonl, 'text/jsonl')})
+            response.raise_for_status()
+        
+        data = await graphql(client, BULK_OPERATION_RUN_MUTATION, {"mutation": BULK_PRODUCT_SET, "stagedUploadPath": fields['key']},
+                             idempotent=False)
+    except (httpx.HTTPError, RuntimeError, KeyError, IndexError) as e:
+        print(f"  ⚠️  Bulk operation could not be submitted: {e}")
+        return None
+    
+    if not bulk_submitted(data, len(products)):
+        return None
+    
+    try:
+        for delay in bulk_poll_delays():
+            await asyncio.sleep(delay)
+            operation = (await graphql(client, CURRENT_BULK_OPERATION, cost=1))['currentBulkOperation']
+            if bulk_settled(operation):
+                break
+        
+        result_url = bulk_result_url(operation)
+        if result_url is None:
+            return 0
+        
+        async with httpx.AsyncClient(timeout=300.0) as storage:
+            response = await storage.get(result_url)
+            response.raise_for_status()
+    except (httpx.HTTPError, RuntimeError) as e:
+        print(f"  ❌ Lost track of the bulk operation: {e}")
+        return 0
+    
+    return count_bulk_results(response.content)
+
+def read_products(csv_file: str, product_type: str) -> Iterator[Dict]:
+    """Stream product rows from the CSV, parsed once here; malformed rows never reach the API"""
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            product_data = coerce_row(row)
+            if product_data is None:
+                print(f"  ⚠️  Skipping {row.get('title', '')}: bad price {row.get('price')!r}")
+                continue
+            product_data['_product_type'] = product_type
+            yield product_data
+
+async def import_concurrently(client: httpx.AsyncClient, products: Iterable[Dict], extra_fields: List[str], workers: int) -> Tuple[int, int]:
+    """(created, attempted) after running create_product over products, at most `workers` at a time"""
+    
+    # Each product is a chain of network round trips. Products stream into tasks;
+    # the semaphore caps how many are in flight (and in memory)
+    semaphore = asyncio.Semaphore(workers)
+    running = set()
+    success_count = 0
+    total = 0
+    
+    async def task(product_data: Dict):
+        nonlocal success_count
+        try:
+            if await create_product(client, product_data, extra_fields):
+                success_count += 1
+        except Exception as e:
+            print(f"  ❌ Failed: {product_data.get('title', '')} - {e}")
+        finally:
+            semaphore.release()
+    
+    for product_data in products:
+        await semaphore.acquire()
+        future = asyncio.create_task(task(product_data))
+        running.add(future)
+        future.add_done_callback(running.discard)
+        total += 1
+    await asyncio.gather(*running)
+    
+    return success_count, total
+
+async def import_products(csv_file: str, product_type: str, workers: int = 8, bulk: bool = False):
     """Import products from CSV to Shopify"""
     
     print(f"📦 Generic Shopify Product Importer")
@@ -228,35 +470,47 @@ def import_products(csv_file: str, product_type: str):
     
     print(f"🏷️  Extra fields: {', '.join(extra_fields) if extra_fields else 'none'}")
     
-    # Read CSV
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        products = list(reader)
+    print(f"\n🚀 Importing products...")
     
-    print(f"\n🚀 Importing {len(products)} products...")
+    headers = {
+        'X-Shopify-Access-Token': access_token,
+        'Content-Type': 'application/json'
+    }
+    limits = httpx.Limits(max_keepalive_connections=workers, max_connections=workers, keepalive_expiry=85)
     
-    # Import each product
-    success_count = 0
-    for i, product_data in enumerate(products, 1):
-        print(f"[{i}/{len(products)}]", end=" ")
-        product_data['_product_type'] = product_type
+    async with httpx.AsyncClient(base_url=shop_url, headers=headers, http2=_HTTP2, limits=limits, timeout=30.0) as client:
+        products = read_products(csv_file, product_type)
         
-        if create_product(shop_url, access_token, product_data, extra_fields):
-            success_count += 1
+        # Bulk mode needs the whole catalog up front to write the JSONL
+        if bulk:
+            products = list(products)
+            if len(products) >= BULK_MIN_PRODUCTS:
+                created = await bulk_import(client, products, extra_fields)
+                if created is not None:
+                    print(f"\n✅ Import complete: {created}/{len(products)} products imported")
+                    return 0
+                print("  ↩️  Falling back to per-product import")
         
-        time.sleep(0.5)
+        success_count, total = await import_concurrently(client, products, extra_fields, workers)
     
-    print(f"\n✅ Import complete: {success_count}/{len(products)} products imported")
+    print(f"\n✅ Import complete: {success_count}/{total} products imported")
     return 0
 
 def main():
     parser = argparse.ArgumentParser(description="Generic Shopify Product Importer")
     parser.add_argument("--csv", required=True, help="CSV file to import")
     parser.add_argument("--product", required=True, help="Product type (e.g., fish, wine)")
+    parser.add_argument("--workers", type=int, default=8, help="Products imported concurrently")
+    parser.add_argument("--plus", action="store_true", help="Shopify Plus store (REST bucket of 80, leaking 4/s)")
+    parser.add_argument("--bulk", action="store_true",
+                        help=f"Run catalogs of {BULK_MIN_PRODUCTS}+ products as one Shopify bulk operation")
     
     args = parser.parse_args()
     
-    return import_products(args.csv, args.product)
+    if args.plus:
+        REST_BUCKET.sync(capacity=80, rate=4)
+    
+    return asyncio.run(import_products(args.csv, args.product, args.workers, args.bulk))
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -5,16 +5,61 @@ Handles the standard Shopify CSV format with multiple rows per product for varia
 """
 
 import csv
+import importlib.util
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 import time
 import sys
+import threading
 from pathlib import Path
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from shopify_api import (
+    BULK_MIN_PRODUCTS, BULK_OPERATION_RUN_MUTATION, BULK_PRODUCT_SET, BULK_UPLOAD_INPUT, CURRENT_BULK_OPERATION,
+    GRAPHQL_BUCKET, METAFIELDS_PER_CALL, METAFIELDS_SET, METAFIELDS_SET_COST, REST_BUCKET, STAGED_UPLOADS_CREATE,
+    TokenBucket, bulk_jsonl, bulk_poll_delays, bulk_result_url, bulk_settled, bulk_staged_target, bulk_submitted,
+    count_bulk_results, graphql_data, json_dumps, json_loads, retry_delay, track_graphql_cost,
+)
 
+# One keep-alive pool shared by every helper and worker thread, so repeat calls
+# to the shop skip the TCP + TLS handshake. Sized above the worker count.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0))
+
+def _never_sent(error: requests.RequestException) -> bool:
+    """True when the request failed before reaching Shopify (DNS, refused or timed-out connect)"""
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+def with_retry(send, bucket: TokenBucket = REST_BUCKET, cost: float = 1, max_attempts: int = 8,
+               idempotent: bool = True) -> requests.Response:
+    """Call send() until Shopify stops throttling or erroring, backing off as retry_delay says (see there for idempotent)"""
+    for attempt in range(max_attempts):
+        last_attempt = attempt == max_attempts - 1
+        time.sleep(bucket.reserve(cost))
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if last_attempt or not (idempotent or _never_sent(e)):
+                raise
+            response = None
+        
+        delay = retry_delay(response, attempt, bucket, idempotent)
+        if delay is None or last_attempt:
+            return response
+        time.sleep(delay)
+
+# Columns mapped onto product/variant fields; every other non-empty column becomes a metafield
+_SHOPIFY_CORE_COLUMNS = frozenset({
+    'Handle', 'Title', 'Variant SKU', 'Variant Price', 'Variant Compare At Price',
+    'Body HTML', 'Vendor', 'Type', 'Tags', 'Image Src', 'Option1 Name', 'Option1 Value', 'Status'
+})
+
+@lru_cache(maxsize=1)
 def load_shopify_credentials():
     """Load Shopify credentials"""
     try:
-        import importlib.util
         config_path = Path(__file__).parent / 'config.py'
         spec = importlib.util.spec_from_file_location("config", config_path)
         config = importlib.util.module_from_spec(spec)
@@ -24,59 +69,69 @@ def load_shopify_credentials():
         print(f"❌ Could not load config: {e}")
         return None, None
 
+@lru_cache(maxsize=8)
 def load_product_config(product_type: str):
     """Load product config for extra fields"""
     try:
-        import yaml
-        config_path = Path(__file__).parent / 'config' / 'products' / f'{product_type}.yaml'
-        with open(config_path) as f:
-            return yaml.safe_load(f)
+        from config.config_manager import load_product_config as load_config
+        return load_config(product_type)
     except:
         return {'extra_fields': []}
 
 def parse_shopify_csv(csv_file: str):
-    """Parse Shopify CSV and group variants by product"""
-    products = defaultdict(lambda: {'variants': []})
+    """Yield (handle, product) as the CSV streams, grouping each handle's variant rows (contiguous in Shopify exports)"""
+    handle, product = None, None
+    # Handles already yielded; a group can't be reopened once it has gone out to be created
+    emitted = set()
     
     with open(csv_file, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         
         for row in reader:
-            handle = row.get('Handle', '')
-            
             # First row of product has full data
-            if not products[handle]['variants']:
-                products[handle]['title'] = row.get('Title', '')
-                products[handle]['body_html'] = row.get('Body HTML', '')
-                products[handle]['vendor'] = row.get('Vendor', 'Citarella')
-                products[handle]['product_type'] = row.get('Type', '')
-                products[handle]['tags'] = row.get('Tags', '')
-                products[handle]['image'] = row.get('Image Src', '')
-                products[handle]['status'] = row.get('Status', 'active')
+            if product is None or row.get('Handle', '') != handle:
+                if product is not None:
+                    emitted.add(handle)
+                    yield handle, product
+                handle = row.get('Handle', '')
+                if handle in emitted:
+                    # Unsorted CSV: importing these rows would create a second product with this handle
+                    print(f"  ⚠️  Skipping row {reader.line_num}: handle '{handle}' already imported from earlier rows "
+                          f"(sort the CSV by Handle to keep its variants together)")
+                    product = None
+                    continue
+                product = {
+                    'title': row.get('Title', ''),
+                    'body_html': row.get('Body HTML', ''),
+                    'vendor': row.get('Vendor', 'Citarella'),
+                    'product_type': row.get('Type', ''),
+                    'tags': row.get('Tags', ''),
+                    'image': row.get('Image Src', ''),
+                    'status': row.get('Status', 'active'),
+                    'variants': [],
+                }
                 
                 # Extra fields (metafields)
-                products[handle]['metafields'] = {}
-                for key in row.keys():
-                    if key not in ['Handle', 'Title', 'Variant SKU', 'Variant Price', 'Variant Compare At Price', 
-                                   'Body HTML', 'Vendor', 'Type', 'Tags', 'Image Src', 'Option1 Name', 'Option1 Value', 'Status']:
-                        if row.get(key):
-                            products[handle]['metafields'][key] = row[key]
+                product['metafields'] = {
+                    key: value for key, value in row.items()
+                    if key not in _SHOPIFY_CORE_COLUMNS and value
+                }
             
             # Add variant
-            products[handle]['variants'].append({
+            product['variants'].append({
                 'sku': row.get('Variant SKU', ''),
                 'price': row.get('Variant Price', '0'),
                 'compare_at_price': row.get('Variant Compare At Price', ''),
                 'option1': row.get('Option1 Value', '')
             })
     
-    return dict(products)
+    if product is not None:
+        yield handle, product
 
 def create_product_with_variants(shop_url: str, access_token: str, handle: str, product_data: dict, product_type: str):
     """Create product with variants in Shopify"""
     
     url = f"{shop_url}/admin/api/2025-07/products.json"
-    headers = {'X-Shopify-Access-Token': access_token, 'Content-Type': 'application/json'}
     
     # Build variants
     variants = []
@@ -107,10 +162,10 @@ def create_product_with_variants(shop_url: str, access_token: str, handle: str,
     if variants[0].get('option1'):
         product['product']['options'] = [{'name': 'Size', 'values': [v['option1'] for v in variants]}]
     
-    response = requests.post(url, headers=headers, json=product)
+    response = with_retry(lambda: SESSION.post(url, data=json_dumps(product)), idempotent=False)
     
     if response.status_code == 201:
-        result = response.json()['product']
+        result = json_loads(response.content)['product']
         product_id = result['id']
         
         print(f"  ✅ Created: {product_data['title']} ({len(variants)} variant(s))")
@@ -138,45 +193,150 @@ def add_image(shop_url: str, access_token: str, product_id: int, image_url: str)
         return
     
     url = f"{shop_url}/admin/api/2025-07/products/{product_id}/images.json"
-    headers = {'X-Shopify-Access-Token': access_token, 'Content-Type': 'application/json'}
     
     try:
-        requests.post(url, headers=headers, json={'image': {'src': image_url}}, timeout=10)
-        time.sleep(0.3)
-    except:
-        pass
+        response = with_retry(lambda: SESSION.post(url, data=json_dumps({'image': {'src': image_url}}), timeout=10),
+                              idempotent=False)
+        if response.status_code not in (200, 201):
+            print(f"  ⚠️  Image failed: HTTP {response.status_code}")
+    except requests.RequestException as e:
+        print(f"  ⚠️  Image failed: {e}")
 
 def add_metafields(shop_url: str, access_token: str, product_id: int, metafields: dict, namespace: str):
     """Add metafields to product"""
     
-    url = f"{shop_url}/admin/api/2025-07/products/{product_id}/metafields.json"
-    headers = {'X-Shopify-Access-Token': access_token, 'Content-Type': 'application/json'}
-    
-    for key, value in metafields.items():
-        if value and value != 'N/A':
-            data = {
-                'metafield': {
-                    'namespace': namespace,
-                    'key': key.lower().replace(' ', '_'),
-                    'value': str(value),
-                    'type': 'single_line_text_field'
-                }
-            }
-            
-            try:
-                requests.post(url, headers=headers, json=data, timeout=10)
-                time.sleep(0.3)
-            except:
-                pass
+    url = f"{shop_url}/admin/api/2025-07/graphql.json"
+    owner_id = f"gid://shopify/Product/{product_id}"
+    
+    inputs = [
+        {
+            'ownerId': owner_id,
+            'namespace': namespace,
+            'key': key.lower().replace(' ', '_'),
+            'value': str(value),
+            'type': 'single_line_text_field'
+        }
+        for key, value in metafields.items() if value and value != 'N/A'
+    ]
+    
+    # One mutation per 25 fields instead of one REST call per field
+    for start in range(0, len(inputs), METAFIELDS_PER_CALL):
+        batch = {"query": METAFIELDS_SET, "variables": {"metafields": inputs[start:start + METAFIELDS_PER_CALL]}}
+        try:
+            response = with_retry(lambda: SESSION.post(url, data=json_dumps(batch), timeout=10),
+                                  bucket=GRAPHQL_BUCKET, cost=METAFIELDS_SET_COST)
+        except requests.RequestException as e:
+            print(f"  ⚠️  Metafields failed: {e}")
+            continue
+        
+        if response.status_code != 200:
+            print(f"  ⚠️  Metafields failed: HTTP {response.status_code}")
+            continue
+        
+        result = json_loads(response.content)
+        track_graphql_cost(result)
+        errors = result.get('errors') or (result.get('data') or {}).get('metafieldsSet', {}).get('userErrors')
+        if errors:
+            print(f"  ⚠️  Metafields failed: {errors}")
+
+def product_set_input(product_data: dict, namespace: str) -> dict:
+    """GraphQL ProductSetInput for one parsed product, its variants, image and metafields (bulk mode)"""
+    
+    option_name = 'Size' if product_data['variants'][0].get('option1') else 'Title'
+    variants = []
+    for variant in product_data['variants']:
+        var_input = {
+            'optionValues': [{'optionName': option_name, 'name': variant['option1'] or 'Default Title'}],
+            'price': variant['price'],
+            'sku': variant['sku']
+        }
+        if variant.get('compare_at_price'):
+            var_input['compareAtPrice'] = variant['compare_at_price']
+        variants.append(var_input)
+    
+    option_values = dict.fromkeys(v['optionValues'][0]['name'] for v in variants)
+    product = {
+        'title': product_data['title'],
+        'descriptionHtml': product_data['body_html'],
+        'vendor': product_data['vendor'],
+        'productType': product_data['product_type'],
+        'tags': [tag.strip() for tag in product_data['tags'].split(',') if tag.strip()],
+        'status': product_data['status'].upper(),
+        'productOptions': [{'name': option_name, 'values': [{'name': value} for value in option_values]}],
+        'variants': variants,
+        'metafields': [
+            {'namespace': namespace, 'key': key.lower().replace(' ', '_'), 'value': str(value), 'type': 'single_line_text_field'}
+            for key, value in product_data['metafields'].items() if value and value != 'N/A'
+        ]
+    }
+    if product_data.get('image'):
+        product['files'] = [{'originalSource': product_data['image'], 'contentType': 'IMAGE'}]
+    return product
+
+def graphql(shop_url: str, query: str, variables: dict = None, cost: float = 10, idempotent: bool = True) -> dict:
+    """data of a GraphQL call, metered through GRAPHQL_BUCKET; raises on HTTP or top-level GraphQL errors"""
+    url = f"{shop_url}/admin/api/2025-07/graphql.json"
+    body = json_dumps({'query': query, 'variables': variables or {}})
+    response = with_retry(lambda: SESSION.post(url, data=body, timeout=30), bucket=GRAPHQL_BUCKET, cost=cost,
+                          idempotent=idempotent)
+    response.raise_for_status()
+    return graphql_data(json_loads(response.content))
+
+def bulk_import(shop_url: str, products: list, product_type: str):
+    """Create every product server-side with one bulkOperationRunMutation; how many were created, or None if it couldn't be submitted"""
+    
+    jsonl = bulk_jsonl(product_set_input(product_data, product_type) for _, product_data in products)
+    
+    try:
+        url, fields = bulk_staged_target(graphql(shop_url, STAGED_UPLOADS_CREATE, BULK_UPLOAD_INPUT))
+        
+        # The target is cloud storage, not the Admin API: plain requests, so the session's access token isn't sent there
+        response = requests.post(url, data=fields, files={'file': ('products.jsonl', jsonl, 'text/jsonl')}, timeout=300)
+        response.raise_for_status()
+        
+        data = graphql(shop_url, BULK_OPERATION_RUN_MUTATION, {'mutation': BULK_PRODUCT_SET, 'stagedUploadPath': fields['key']},
+                       idempotent=False)
+    except (requests.RequestException, RuntimeError, KeyError, IndexError) as e:
+        print(f"  ⚠️  Bulk operation could not be submitted: {e}")
+        return None
+    
+    if not bulk_submitted(data, len(products)):
+        return None
+    
+    try:
+        for delay in bulk_poll_delays():
+            time.sleep(delay)
+            operation = graphql(shop_url, CURRENT_BULK_OPERATION, cost=1)['currentBulkOperation']
+            if bulk_settled(operation):
+                break
+        
+        result_url = bulk_result_url(operation)
+        if result_url is None:
+            return 0
+        
+        response = requests.get(result_url, timeout=300)
+        response.raise_for_status()
+    except (requests.RequestException, RuntimeError) as e:
+        print(f"  ❌ Lost track of the bulk operation: {e}")
+        return 0
+    
+    return count_bulk_results(response.content)
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Import Shopify CSV with Variants")
     parser.add_argument("--csv", required=True)
     parser.add_argument("--product", required=True)
+    parser.add_argument("--workers", type=int, default=8, help="Products imported in parallel")
+    parser.add_argument("--plus", action="store_true", help="Shopify Plus store (REST bucket of 80, leaking 4/s)")
+    parser.add_argument("--bulk", action="store_true",
+                        help=f"Run catalogs of {BULK_MIN_PRODUCTS}+ products as one Shopify bulk operation")
     
     args = parser.parse_args()
     
+    if args.plus:
+        REST_BUCKET.sync(capacity=80, rate=4)
+    
     print("📦 Shopify CSV Importer (with Variants)")
     print("=" * 40)
     
@@ -184,24 +344,51 @@ def main():
     if not shop_url:
         return 1
     
+    SESSION.headers.update({'X-Shopify-Access-Token': access_token, 'Content-Type': 'application/json'})
+    
     print(f"🏪 Store: {shop_url}")
     print(f"📂 CSV: {args.csv}")
     print(f"📦 Product Type: {args.product}\n")
     
-    # Parse CSV
+    print(f"🚀 Importing products...")
+    
     products = parse_shopify_csv(args.csv)
     
-    print(f"🚀 Importing {len(products)} products...")
+    # Bulk mode needs the whole catalog up front to write the JSONL
+    if args.bulk:
+        products = list(products)
+        if len(products) >= BULK_MIN_PRODUCTS:
+            created = bulk_import(shop_url, products, args.product)
+            if created is not None:
+                print(f"\n✅ Import complete: {created}/{len(products)} products")
+                return 0
+            print("  ↩️  Falling back to per-product import")
     
-    # Import each
+    # Import in parallel - each product is a chain of network round trips.
+    # Products stream out of the CSV parser into the pool, so only a few are held in memory at once
+    slots = threading.BoundedSemaphore(args.workers * 2)
+    lock = threading.Lock()
     success = 0
-    for i, (handle, product_data) in enumerate(products.items(), 1):
-        print(f"[{i}/{len(products)}]", end=" ")
-        if create_product_with_variants(shop_url, access_token, handle, product_data, args.product):
-            success += 1
-        time.sleep(0.5)
+    total = 0
+    
+    def task(handle: str, product_data: dict):
+        nonlocal success
+        try:
+            if create_product_with_variants(shop_url, access_token, handle, product_data, args.product):
+                with lock:
+                    success += 1
+        except Exception as e:
+            print(f"  ❌ Failed: {product_data['title']} - {e}")
+        finally:
+            slots.release()
+    
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for handle, product_data in products:
+            slots.acquire()
+            executor.submit(task, handle, product_data)
+            total += 1
     
-    print(f"\n✅ Import complete: {success}/{len(products)} products")
+    print(f"\n✅ Import complete: {success}/{total} products")
     return 0
 
 if __name__ == "__main__":
@@ -3,17 +3,23 @@
 Import Wines - Import wine products using existing metafields
 """
 
-import sys
+import argparse
 import os
 from shopify_wine_importer import ShopifyWineImporter
 
 def main():
     """Import wine products from CSV file"""
+    parser = argparse.ArgumentParser(description="Import wine products from CSV file")
+    parser.add_argument("csv_file", nargs="?", help="Wine catalog CSV")
+    parser.add_argument("--max-consecutive-failures", type=int, default=10,
+                        help="Abort once more than this many products fail in a row")
+    args = parser.parse_args()
+    
     print("🍷 Wine Product Importer")
     print("=" * 50)
     
     # Check for CSV file argument
-    if len(sys.argv) < 2:
+    if not args.csv_file:
         print("Usage: python3 import_wines.py <wine_catalog.csv>")
         print()
         print("Examples:")
@@ -24,7 +30,7 @@ def main():
         print("Note: Make sure to run 'python3 setup_metafields.py' first!")
         return
     
-    csv_file = sys.argv[1]
+    csv_file = args.csv_file
     
     # Check if file exists
     if not os.path.exists(csv_file):
@@ -73,32 +79,35 @@ def main():
     # Import products (metafields should already exist)
     print("📦 Importing wine products...")
     success_count = 0
+    processed = 0
+    consecutive_failures = 0
     
     for i, product_data in enumerate(shopify_products, 1):
         print(f"  [{i}/{len(shopify_products)}] {product_data['product']['title']}", end="... ")
         
         success = importer.create_product(product_data)
+        processed = i
         if success:
             print("✅")
             success_count += 1
+            consecutive_failures = 0
         else:
             print("❌")
+            consecutive_failures += 1
             
-            # Ask if they want to continue (only for actual critical failures)
+            # A long run of failures means something systemic (credentials, store down) - stop instead of grinding on
+            if consecutive_failures > args.max_consecutive_failures:
+                print(f"    🛑 {consecutive_failures} failures in a row - aborting import")
+                break
             if i < len(shopify_products):
-                # Auto-continue for bulk imports - only pause on critical errors
                 print("    ⚠️ Continuing with next product (non-critical error)...")
-                # Uncomment below if you want manual prompts:
-                # response = input("    Continue importing? (y/n): ").lower()
-                # if response not in ['y', 'yes']:
-                #     break
     
     # Summary
     print()
     print("📋 Import Summary:")
     print(f"  ✅ Successfully imported: {success_count}")
-    print(f"  ❌ Failed: {len(shopify_products) - success_count}")
-    print(f"  📊 Total processed: {len(shopify_products)}")
+    print(f"  ❌ Failed: {processed - success_count}")
+    print(f"  📊 Total processed: {processed}/{len(shopify_products)}")
     
     if success_count > 0:
         print()
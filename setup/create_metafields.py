@@ -29,11 +29,9 @@ def get_metafields_for_product_type(product_type: str) -> list:
     
     # Load product config
     try:
-        import yaml
-        config_path = Path(__file__).parent.parent / 'config' / 'products' / f'{product_type}.yaml'
-        with open(config_path) as f:
-            config = yaml.safe_load(f)
-            extra_fields = config.get('extra_fields', [])
+        from config.config_manager import load_product_config
+        config = load_product_config(product_type)
+        extra_fields = config.get('extra_fields', [])
     except:
         print(f"❌ Could not load product config for {product_type}")
         return []
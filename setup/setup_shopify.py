@@ -4,13 +4,22 @@ Shopify Setup - Auto-create collections from CSV data
 """
 
 import argparse
+import asyncio
 import csv
-import requests
+import httpx
+import importlib.util
+import json
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
+# Requests in flight at once; Shopify's REST bucket holds 40 calls and leaks 2/s
+_CONCURRENCY = 8
+
+# HTTP/2 multiplexes every in-flight request over one connection; it needs the h2 package (httpx[http2])
+_HTTP2 = importlib.util.find_spec('h2') is not None
+
 def load_shopify_credentials():
     """Load Shopify credentials from config"""
     try:
@@ -56,14 +65,43 @@ def analyze_csv_for_collections(csv_file: str) -> set:
     
     return collections
 
-def create_collection(shop_url: str, access_token: str, collection_name: str):
+async def _post(client: httpx.AsyncClient, url: str, data: dict, attempts: int = 3):
+    """(status, body) of a POST, waiting out 429s and easing off as the call bucket fills"""
+    for attempt in range(attempts):
+        response = await client.post(url, json=data)
+        
+        if response.status_code == 429 and attempt < attempts - 1:
+            await asyncio.sleep(float(response.headers.get('Retry-After', 2)))
+            continue
+        # Close to the cap: give the bucket a moment to leak before the next call goes out
+        used, _, limit = response.headers.get('X-Shopify-Shop-Api-Call-Limit', '').partition('/')
+        if used.isdigit() and limit.isdigit() and int(used) >= int(limit) - _CONCURRENCY:
+            await asyncio.sleep(1)
+        return response.status_code, response.text
+
+async def load_existing_collections(client: httpx.AsyncClient, shop_url: str) -> dict:
+    """Title -> id of every custom and smart collection, from one paginated sweep"""
+    existing = {}
+    for kind in ('custom_collections', 'smart_collections'):
+        url = f"{shop_url}/admin/api/2025-07/{kind}.json?limit=250&fields=id,title"
+        while url:
+            response = await client.get(url)
+            if response.status_code != 200:
+                print(f"  ⚠️  Could not list {kind}: {response.status_code}")
+                break
+            existing.update((c['title'], c['id']) for c in response.json().get(kind, []))
+            url = response.links.get('next', {}).get('url')
+    return existing
+
+async def create_collection(client: httpx.AsyncClient, shop_url: str, collection_name: str, collection_ids: dict = None):
     """Create a smart collection in Shopify"""
     
+    # Collections already in the store need no request at all
+    if collection_ids is not None and collection_name in collection_ids:
+        print(f"  ⏭️  Already exists: {collection_name}")
+        return True
+    
     url = f"{shop_url}/admin/api/2025-07/custom_collections.json"
-    headers = {
-        'X-Shopify-Access-Token': access_token,
-        'Content-Type': 'application/json'
-    }
     
     data = {
         "custom_collection": {
@@ -72,18 +110,48 @@ def create_collection(shop_url: str, access_token: str, collection_name: str):
         }
     }
     
-    response = requests.post(url, headers=headers, json=data)
+    try:
+        status, text = await _post(client, url, data)
+    except httpx.HTTPError as e:
+        print(f"  ❌ Failed: {collection_name} - {e}")
+        return False
     
-    if response.status_code == 201:
+    if status == 201:
         print(f"  ✅ Created: {collection_name}")
+        if collection_ids is not None:
+            collection_ids[collection_name] = json.loads(text).get('custom_collection', {}).get('id')
         return True
-    elif 'already exists' in response.text.lower():
+    elif 'already exists' in text.lower():
         print(f"  ⏭️  Already exists: {collection_name}")
         return True
     else:
-        print(f"  ❌ Failed: {collection_name} - {response.status_code}")
+        print(f"  ❌ Failed: {collection_name} - {status}")
         return False
 
+async def create_collections(shop_url: str, access_token: str, collection_names) -> int:
+    """Create all collections concurrently over one keep-alive client; returns how many are ready"""
+    headers = {
+        'X-Shopify-Access-Token': access_token,
+        'Content-Type': 'application/json'
+    }
+    semaphore = asyncio.Semaphore(_CONCURRENCY)
+    limits = httpx.Limits(max_keepalive_connections=4, max_connections=_CONCURRENCY, keepalive_expiry=85)
+    
+    async with httpx.AsyncClient(headers=headers, http2=_HTTP2, limits=limits, timeout=30.0) as client:
+        try:
+            collection_ids = await load_existing_collections(client, shop_url)
+        except httpx.HTTPError as e:
+            print(f"  ⚠️  Could not list existing collections: {e}")
+            collection_ids = {}
+        
+        async def create(collection_name: str):
+            async with semaphore:
+                return await create_collection(client, shop_url, collection_name, collection_ids)
+        
+        results = await asyncio.gather(*(create(name) for name in collection_names))
+    
+    return sum(results)
+
 def main():
     parser = argparse.ArgumentParser(description="Setup Shopify Collections from CSV")
     parser.add_argument("--csv", required=True, help="CSV file to analyze")
@@ -111,10 +179,7 @@ def main():
     print(f"\n🚀 Creating collections...")
     
     # Create collections
-    success_count = 0
-    for collection_name in collections:
-        if create_collection(shop_url, access_token, collection_name):
-            success_count += 1
+    success_count = asyncio.run(create_collections(shop_url, access_token, collections))
     
     print(f"\n✅ Setup complete: {success_count}/{len(collections)} collections ready")
     return 0
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Shopify Admin API pacing shared by the CSV importers
+Rate-limit buckets, retry decisions, GraphQL cost tracking and the bulk-operation pieces;
+each importer keeps only its own transport (httpx async or threaded requests)
+"""
+
+import json
+import random
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+# orjson (de)serializes request and response bodies several times faster; json behaves the same without it
+try:
+    import orjson
+    json_dumps, json_loads = orjson.dumps, orjson.loads
+except ImportError:
+    json_dumps, json_loads = (lambda obj: json.dumps(obj).encode()), json.loads
+
+class TokenBucket:
+    """Call budget shared by every in-flight import, threads or tasks: refills `rate` tokens/s up to `capacity`"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        # Only guards the arithmetic, never a wait, so it is safe to take from the event loop too
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, n: float = 1) -> float:
+        """Take n tokens and return how long to sleep before spending them; later callers queue behind the debt"""
+        with self._lock:
+            self._refill()
+            self.tokens -= n
+            return max(0.0, -self.tokens / self.rate)
+    
+    def sync(self, available: float = None, capacity: float = None, rate: float = None):
+        """Adopt Shopify's own view of the bucket (GraphQL throttleStatus, Plus limits)"""
+        with self._lock:
+            self._refill()
+            if capacity is not None:
+                self.capacity = capacity
+            if rate is not None:
+                self.rate = rate
+            if available is not None:
+                self.tokens = min(self.capacity, available)
+
+# REST allows 40 calls, leaking 2/s; Plus stores get 80 at 4/s (the importers' --plus flag)
+REST_BUCKET = TokenBucket(rate=2, capacity=40)
+
+# GraphQL is metered in cost points: 1000 restoring at 50/s, corrected from each response's throttleStatus
+GRAPHQL_BUCKET = TokenBucket(rate=50, capacity=1000)
+
+def retry_delay(response, attempt: int, bucket: TokenBucket, idempotent: bool = True) -> Optional[float]:
+    """Seconds to wait before resending, or None if the reply is final; response None means the connection never opened
+    
+    Creates pass idempotent=False: a 5xx may still have created the product, so only
+    throttled replies (429, GraphQL THROTTLED) and unopened connections are resent.
+    """
+    # GraphQL throttling is a 200 whose errors say THROTTLED, not a 429
+    throttled = None if response is None or bucket is not GRAPHQL_BUCKET else graphql_throttle_delay(response)
+    if not (response is None or throttled is not None or response.status_code == 429 or (
+            idempotent and response.status_code >= 500)):
+        return None
+    
+    # Honour Retry-After when Shopify sends it, otherwise double the wait (1s..60s); jitter spreads out the callers
+    try:
+        delay = throttled if throttled is not None else float(response.headers['Retry-After'])
+    except (AttributeError, KeyError, ValueError):
+        delay = min(60, 2 ** attempt)
+    return delay + random.uniform(0, 0.5)
+
+def graphql_throttle_delay(response) -> Optional[float]:
+    """Seconds until a THROTTLED GraphQL query's cost is restored, or None if it wasn't throttled"""
+    if response.status_code != 200 or b'THROTTLED' not in response.content:
+        return None
+    result = json_loads(response.content)
+    if not any((e.get('extensions') or {}).get('code') == 'THROTTLED' for e in result.get('errors', [])):
+        return None
+    track_graphql_cost(result)
+    cost = result.get('extensions', {}).get('cost', {})
+    throttle = cost.get('throttleStatus')
+    if not throttle:
+        return 1.0
+    missing = cost.get('requestedQueryCost', 0) - throttle['currentlyAvailable']
+    return max(missing, 0) / throttle['restoreRate']
+
+def track_graphql_cost(result: dict):
+    """Resync GRAPHQL_BUCKET from the throttleStatus Shopify returns with every GraphQL response"""
+    throttle = result.get('extensions', {}).get('cost', {}).get('throttleStatus')
+    if throttle:
+        GRAPHQL_BUCKET.sync(throttle['currentlyAvailable'], throttle['maximumAvailable'], throttle['restoreRate'])
+
+def graphql_data(result: dict) -> Dict:
+    """data of a decoded GraphQL response, after resyncing the cost bucket; raises on top-level errors"""
+    track_graphql_cost(result)
+    if 'errors' in result:
+        raise RuntimeError(f"GraphQL errors: {result['errors']}")
+    return result['data']
+
+METAFIELDS_SET = """
+mutation metafieldsSet($metafields: [MetafieldsSetInput!]!) {
+    metafieldsSet(metafields: $metafields) {
+        userErrors {
+            field
+            message
+        }
+    }
+}
+"""
+METAFIELDS_PER_CALL = 25  # metafieldsSet's input cap
+METAFIELDS_SET_COST = 10
+
+# With --bulk, catalogs this size and up run as one server-side bulk operation; smaller ones aren't worth the polling
+BULK_MIN_PRODUCTS = 500
+
+STAGED_UPLOADS_CREATE = """
+mutation stagedUploadsCreate($input: [StagedUploadInput!]!) {
+    stagedUploadsCreate(input: $input) {
+        stagedTargets {
+            url
+            parameters {
+                name
+                value
+            }
+        }
+        userErrors {
+            field
+            message
+        }
+    }
+}
+"""
+# stagedUploadsCreate variables for the bulk operation's JSONL input
+BULK_UPLOAD_INPUT = {"input": [{
+    "resource": "BULK_MUTATION_VARIABLES",
+    "filename": "products.jsonl",
+    "mimeType": "text/jsonl",
+    "httpMethod": "POST"
+}]}
+BULK_OPERATION_RUN_MUTATION = """
+mutation bulkOperationRunMutation($mutation: String!, $stagedUploadPath: String!) {
+    bulkOperationRunMutation(mutation: $mutation, stagedUploadPath: $stagedUploadPath) {
+        bulkOperation {
+            id
+            status
+        }
+        userErrors {
+            field
+            message
+        }
+    }
+}
+"""
+CURRENT_BULK_OPERATION = """
+query {
+    currentBulkOperation(type: MUTATION) {
+        id
+        status
+        errorCode
+        url
+    }
+}
+"""
+# Run once per JSONL line, with that line's {"input": ...} as its variables
+BULK_PRODUCT_SET = """
+mutation call($input: ProductSetInput!) {
+    productSet(input: $input) {
+        product {
+            id
+        }
+        userErrors {
+            field
+            message
+        }
+    }
+}
+"""
+
+def bulk_jsonl(inputs: Iterable[Dict]) -> bytes:
+    """The bulk operation's variables file: one {"input": ProductSetInput} line per product"""
+    return b"".join(json_dumps({"input": product_input}) + b"\n" for product_input in inputs)
+
+def bulk_staged_target(data: Dict):
+    """(url, form fields) of the stagedUploadsCreate target the JSONL is posted to"""
+    target = data['stagedUploadsCreate']['stagedTargets'][0]
+    return target['url'], {param['name']: param['value'] for param in target['parameters']}
+
+def bulk_submitted(data: Dict, count: int) -> bool:
+    """True if bulkOperationRunMutation accepted the operation"""
+    run = data['bulkOperationRunMutation']
+    if run['userErrors']:
+        print(f"  ⚠️  Bulk operation rejected: {run['userErrors']}")
+        return False
+    print(f"  📤 Bulk operation {run['bulkOperation']['id']} submitted for {count} products")
+    return True
+
+def bulk_poll_delays() -> Iterable[float]:
+    """Sleeps between currentBulkOperation polls while Shopify works through it server-side: 1s, 2s, 4s .. 30s"""
+    delay = 1
+    while True:
+        yield delay
+        delay = min(30, delay * 2)
+
+def bulk_settled(operation: Dict) -> bool:
+    return operation['status'] not in ('CREATED', 'RUNNING')
+
+def bulk_result_url(operation: Dict) -> Optional[str]:
+    """URL of a settled operation's results, or None (after reporting why) if there are none to count"""
+    if operation['status'] != 'COMPLETED':
+        print(f"  ❌ Bulk operation {operation['status']}: {operation.get('errorCode')}")
+        return None
+    return operation.get('url') or None
+
+def count_bulk_results(content: bytes) -> int:
+    """Products created, from the results JSONL: one productSet payload per input line, userErrors for rows that failed"""
+    created = 0
+    for line in content.splitlines():
+        payload = (json_loads(line).get('data') or {}).get('productSet') or {}
+        if payload.get('product'):
+            created += 1
+        elif payload.get('userErrors'):
+            print(f"  ❌ Failed: {payload['userErrors']}")
+    return created
@@ -7,12 +7,27 @@ Transforms crawled wine data into Shopify format with metafields
 import csv
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 from typing import Dict, List, Any
 from dataclasses import dataclass
 from urllib.parse import urlparse
 
-@dataclass
+# Patterns used for every wine in a catalog, compiled once at import
+_VINTAGE_RE = re.compile(r'\b(19|20)\d{2}\b')
+_HANDLE_STRIP_RE = re.compile(r'[^\w\s-]')
+_HANDLE_DASH_RE = re.compile(r'[-\s]+')
+
+class ShopifyRetry(Retry):
+    """urllib3 Retry that also resends POSTs on 429 - Shopify ran nothing, so it can't duplicate a create"""
+    
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method.upper() == 'POST' and status_code == 429:
+            return bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
+
+@dataclass(slots=True)
 class WineProduct:
     """Wine product data structure"""
     name: str
@@ -47,6 +62,14 @@ class ShopifyWineImporter:
             'X-Shopify-Access-Token': access_token,
             'Content-Type': 'application/json'
         } if access_token else {}
+        # Every call goes to the same shop, so share one keep-alive connection pool
+        self.session = requests.Session()
+        # 429s are waited out (Retry-After) for every call, 5xx only for the idempotent ones
+        retry = ShopifyRetry(total=5, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=32, max_retries=retry))
+        self.session.headers.update(self.headers)
+        # Store locations don't change during an import; fetched once, on first use
+        self._locations = None
         
         # Define wine metafields structure
         self.wine_metafields = {
@@ -108,7 +131,7 @@ class ShopifyWineImporter:
     def extract_vintage_from_name(self, name: str) -> int:
         """Extract vintage year from wine name"""
         # Look for 4-digit year in the name
-        match = re.search(r'\b(19|20)\d{2}\b', name)
+        match = _VINTAGE_RE.search(name)
         return int(match.group()) if match else None
     
     def clean_price(self, price_str: str) -> float:
@@ -130,8 +153,8 @@ class ShopifyWineImporter:
     def generate_handle(self, name: str) -> str:
         """Generate Shopify handle from product name"""
         # Convert to lowercase, replace spaces and special chars with hyphens
-        handle = re.sub(r'[^\w\s-]', '', name.lower())
-        handle = re.sub(r'[-\s]+', '-', handle)
+        handle = _HANDLE_STRIP_RE.sub('', name.lower())
+        handle = _HANDLE_DASH_RE.sub('-', handle)
         return handle.strip('-')
     
     def transform_to_shopify_format(self, wines: List[WineProduct]) -> List[Dict[str, Any]]:
@@ -304,7 +327,7 @@ class ShopifyWineImporter:
             url = f"{self.shop_url}/admin/api/2024-10/metafield_definitions.json"
             
             try:
-                response = requests.post(url, headers=self.headers, json=definition)
+                response = self.session.post(url, json=definition)
                 if response.status_code == 201:
                     print(f"✅ Created metafield definition: wine.{key}")
                 elif response.status_code == 422:
@@ -383,7 +406,7 @@ class ShopifyWineImporter:
             
             # Create product using GraphQL
             url = f"{self.shop_url}/admin/api/2025-07/graphql.json"
-            response = requests.post(url, headers=self.headers, json={"query": create_mutation, "variables": variables})
+            response = self.session.post(url, json={"query": create_mutation, "variables": variables})
             
             if response.status_code == 200:
                 data = response.json()
@@ -443,7 +466,7 @@ class ShopifyWineImporter:
             }
             
             url = f"{self.shop_url}/admin/api/2025-07/products/{product_id}/metafields.json"
-            response = requests.post(url, headers=self.headers, json=metafield_data)
+            response = self.session.post(url, json=metafield_data)
             
             if response.status_code == 201:
                 print(f"   ✅ {metafield['namespace']}.{metafield['key']}")
@@ -477,7 +500,7 @@ class ShopifyWineImporter:
             }
             
             url = f"{self.shop_url}/admin/api/2025-07/products/{product_id}/images.json"
-            response = requests.post(url, headers=self.headers, json=image_data)
+            response = self.session.post(url, json=image_data)
             
             if response.status_code == 200:
                 image_info = response.json()['image']
@@ -493,6 +516,15 @@ class ShopifyWineImporter:
             print(f"   ❌ Error adding image: {e}")
             return False
     
+    def get_locations(self) -> List[Dict[str, Any]]:
+        """Store locations, fetched on first call and reused for every later product (None on failure)"""
+        if self._locations is None:
+            locations_url = f"{self.shop_url}/admin/api/2025-07/locations.json"
+            locations_response = self.session.get(locations_url)
+            if locations_response.status_code == 200:
+                self._locations = locations_response.json()['locations']
+        return self._locations
+    
     def set_product_inventory(self, product_id: str, quantity: int) -> bool:
         """Set inventory tracking and quantity for product at all locations (following working JS approach)"""
         try:
@@ -500,7 +532,7 @@ class ShopifyWineImporter:
             
             # Step 1: Get product variant and inventory item ID
             product_url = f"{self.shop_url}/admin/api/2025-07/products/{product_id}.json"
-            product_response = requests.get(product_url, headers=self.headers)
+            product_response = self.session.get(product_url)
             
             if product_response.status_code != 200:
                 print(f"   ❌ Cannot read product")
@@ -518,7 +550,7 @@ class ShopifyWineImporter:
             }
             
             inventory_url = f"{self.shop_url}/admin/api/2025-07/inventory_items/{inventory_item_id}.json"
-            inventory_response = requests.put(inventory_url, headers=self.headers, json=inventory_item_data)
+            inventory_response = self.session.put(inventory_url, json=inventory_item_data)
             
             if inventory_response.status_code == 200:
                 print(f"   ✅ Inventory tracking enabled")
@@ -527,26 +559,25 @@ class ShopifyWineImporter:
                 return False
             
             # Step 3: Get all locations
-            locations_url = f"{self.shop_url}/admin/api/2025-07/locations.json"
-            locations_response = requests.get(locations_url, headers=self.headers)
+            locations = self.get_locations()
             
-            if locations_response.status_code != 200:
+            if locations is None:
                 print(f"   ❌ Cannot read locations")
                 return False
                 
-            locations = locations_response.json()['locations']
             print(f"   📍 Found {len(locations)} locations")
             
             # Step 4: Connect inventory item to all locations (like JS code)
             print(f"   🔗 Connecting inventory item to all locations...")
-            for location in locations:
-                # Check if already connected
-                query_url = f"{self.shop_url}/admin/api/2025-07/inventory_levels.json?inventory_item_ids={inventory_item_id}&location_ids={location['id']}"
-                query_response = requests.get(query_url, headers=self.headers)
-                
-                if query_response.status_code == 200:
-                    inventory_levels = query_response.json().get('inventory_levels', [])
-                    if not inventory_levels:
+            # Check every location's connection in one request rather than one per location
+            location_ids = ','.join(str(location['id']) for location in locations)
+            query_url = f"{self.shop_url}/admin/api/2025-07/inventory_levels.json?inventory_item_ids={inventory_item_id}&location_ids={location_ids}&limit=250"
+            query_response = self.session.get(query_url)
+            
+            if query_response.status_code == 200:
+                connected = {level['location_id'] for level in query_response.json().get('inventory_levels', [])}
+                for location in locations:
+                    if location['id'] not in connected:
                         # Connect inventory item to this location
                         connect_url = f"{self.shop_url}/admin/api/2025-07/inventory_levels/connect.json"
                         connect_data = {
@@ -554,7 +585,7 @@ class ShopifyWineImporter:
                             "location_id": location['id']
                         }
                         
-                        connect_response = requests.post(connect_url, headers=self.headers, json=connect_data)
+                        connect_response = self.session.post(connect_url, json=connect_data)
                         if connect_response.status_code == 200:
                             print(f"     ✅ Connected to {location['name']}")
                         else:
@@ -601,7 +632,7 @@ class ShopifyWineImporter:
                 }
             }
             
-            graphql_response = requests.post(graphql_url, headers=self.headers, json={"query": mutation, "variables": variables})
+            graphql_response = self.session.post(graphql_url, json={"query": mutation, "variables": variables})
             
             if graphql_response.status_code == 200:
                 data = graphql_response.json()
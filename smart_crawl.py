@@ -7,159 +7,428 @@ Just give it a collection page URL, it does the rest.
 import asyncio
 import aiohttp
 import csv
+import os
 import re
+import sqlite3
 import ssl
-from bs4 import BeautifulSoup
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from bs4 import BeautifulSoup, NavigableString
 from urllib.parse import urljoin, urlparse
 from typing import List, Set, Dict
 import argparse
 
+# lxml's C parser is several times faster than the pure-Python html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Patterns are compiled once at import and shared by every page
+_PRODUCT_LINK_PATTERNS = [re.compile(p) for p in (
+    r'/p/\d+',           # Total Wine: /p/123456
+    r'/dp/[A-Z0-9]+',    # Amazon: /dp/B07ABC123
+    r'/products/[\w-]+', # Shopify stores: /products/product-name
+    r'/item/\d+',        # eBay: /item/123456
+)]
+_PRICE_RE = re.compile(r'\$(\d+\.\d{2})')
+_COMPARE_PRICE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'(?:was|originally|list price|msrp|previously|compare at).*?\$(\d+\.\d{2})',
+    r'\$(\d+\.\d{2}).*?(?:was|originally|list)',
+)]
+# Tried in order, so the first pattern that matches anywhere in the URL wins
+_SKU_URL_RES = tuple(re.compile(p) for p in (
+    r'/p/([^/?]+)',      # Total Wine
+    r'/dp/([^/?]+)',     # Amazon
+    r'/item/(\d+)',      # eBay
+))
+_SKU_TEXT_RE = re.compile(r'SKU[:\s]+([A-Z0-9-]+)', re.IGNORECASE)
+_BRAND_HREF_RE = re.compile(r'/brand/', re.I)
+_BRAND_TEXT_RE = re.compile(r'Brand[:\s]+([A-Za-z0-9\s&-]+)')
+_DESC_CLASS_RE = re.compile(r'description|details|about', re.I)
+_BREADCRUMB_RE = re.compile(r'breadcrumb', re.I)
+
+class _RateLimiter:
+    """Allow one request per `interval` seconds, shared by every coroutine using it"""
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def wait(self):
+        # Reserve the next slot under the lock, then sleep outside it
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+# Columns every product carries, in CSV order; extra fields follow
+STANDARD_FIELDS = ['title', 'price', 'collection', 'description', 'msrp', 'brand', 'sku', 'image_url']
+
+class _PageCache:
+    """Product pages from earlier runs, keyed by URL, with the validators needed to re-check them"""
+    
+    def __init__(self, path: str, ttl: float = 24 * 3600):
+        self.ttl = ttl
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS pages '
+            '(url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body TEXT, fetched_at REAL)'
+        )
+    
+    def get(self, url: str):
+        """(etag, last_modified, body, fetched_at) for url, or None"""
+        return self._db.execute(
+            'SELECT etag, last_modified, body, fetched_at FROM pages WHERE url = ?', (url,)
+        ).fetchone()
+    
+    def put(self, url: str, etag: str, last_modified: str, body: str):
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)',
+                (url, etag, last_modified, body, time.time()),
+            )
+    
+    def touch(self, url: str):
+        with self._db:
+            self._db.execute('UPDATE pages SET fetched_at = ? WHERE url = ?', (time.time(), url))
+    
+    def close(self):
+        self._db.close()
+
+def _tag_text(tag) -> str:
+    """get_text(strip=True), short-cut for the common single-text-node element"""
+    string = tag.string
+    # Exact type check: comments and other NavigableString subclasses aren't part of get_text()
+    if type(string) is NavigableString:
+        return string.strip()
+    return tag.get_text(strip=True)
+
+def _absolute_url(base: str, href: str) -> str:
+    """urljoin, skipping the parse for hrefs that are already absolute"""
+    if href.startswith(('http://', 'https://')):
+        return href
+    return urljoin(base, href)
+
+# Per-process parser used by _parse_worker, set up once by _init_parse_worker as the pool starts
+_WORKER_PARSER = None
+
+def _init_parse_worker(extra_fields: List[str]):
+    """Pool initializer: parse-only crawler state, skipping config loading, SSL and session setup"""
+    global _WORKER_PARSER
+    parser = SmartCrawler.__new__(SmartCrawler)
+    parser._init_parsing(extra_fields)
+    _WORKER_PARSER = parser
+
+def _parse_worker(html: str, url: str) -> Dict:
+    """Parse one product page in a worker process"""
+    return _WORKER_PARSER.extract_product_data(html, url)
+
 class SmartCrawler:
     """Intelligent crawler that auto-detects site structure"""
     
-    def __init__(self, product_type: str = "generic"):
+    def __init__(self, product_type: str = "generic", concurrent_requests: int = 10, rate_limit: float = 0.5,
+                 cache_path: str = None):
         self.product_type = product_type
         self.base_url = ""
+        self.concurrent_requests = concurrent_requests
+        self.products_extracted = 0
+        self.rate_limit = rate_limit
+        # One limiter per host, so politeness holds no matter how many requests are in flight
+        self._limiters: Dict[str, _RateLimiter] = {}
+        self._session = None
+        # Worker processes for page parsing, started on the first crawl and kept until close()
+        self._parse_pool = None
+        # Optional on-disk page cache, so re-crawls only download pages that changed
+        self._cache = _PageCache(cache_path) if cache_path else None
         
         # Load extra fields from config if exists
         try:
-            import yaml
-            from pathlib import Path
-            config_path = Path(__file__).parent / "config" / "products" / f"{product_type}.yaml"
-            if config_path.exists():
-                with open(config_path) as f:
-                    config = yaml.safe_load(f)
-                    self.extra_fields = config.get('extra_fields', [])
-            else:
-                self.extra_fields = []
+            from config.config_manager import load_product_config
+            self.extra_fields = load_product_config(product_type).get('extra_fields', [])
         except:
             self.extra_fields = []
+        self._init_parsing(self.extra_fields)
+        
+        # CSV columns, and a getter that pulls a product's values in that order
+        self.csv_fields = STANDARD_FIELDS + self.extra_fields
+        self._csv_row = itemgetter(*self.csv_fields)
         
         # SSL setup
         self.ssl_context = ssl.create_default_context()
         self.ssl_context.check_hostname = False
         self.ssl_context.verify_mode = ssl.CERT_NONE
     
-    async def crawl(self, collection_url: str) -> List[Dict]:
+    def _init_parsing(self, extra_fields: List[str]):
+        """State extract_product_data needs - all a parse worker sets up"""
+        self.extra_fields = extra_fields
+        self._last_page_text = None
+        
+        # "Field Name: Value" patterns, compiled once for the crawler's lifetime
+        self._field_res = {
+            name: re.compile(rf'{re.escape(name)}[:\s]+([^\n]+)', re.IGNORECASE)
+            for name in extra_fields
+        }
+        self._fields_re, self._field_groups, self._prefixed_fields = self._build_fields_re(extra_fields)
+    
+    def _pool(self) -> ProcessPoolExecutor:
+        """The crawler's parse pool, started on first use; workers get only the parsing state"""
+        if self._parse_pool is None:
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, self.concurrent_requests),
+                initializer=_init_parse_worker,
+                initargs=(self.extra_fields,),
+            )
+        return self._parse_pool
+    
+    @staticmethod
+    def _build_fields_re(field_names: List[str]):
+        """One alternation over every "Field Name: Value" pattern, so a page is scanned once for all fields.
+        
+        Returns (pattern, group -> field name, fields left to their own per-field search).
+        """
+        if not field_names:
+            return None, {}, []
+        names = sorted(set(field_names), key=len, reverse=True)
+        # A name that prefixes another would be tried at the same spots, and only one
+        # alternative can win per position - those keep their own search
+        lowered = [name.lower() for name in names]
+        prefixed = [name for i, name in enumerate(names)
+                    if any(j != i and other.startswith(lowered[i]) for j, other in enumerate(lowered))]
+        groups = {f'f{i}': name for i, name in enumerate(n for n in names if n not in prefixed)}
+        if not groups:
+            return None, {}, prefixed
+        # Every alternative is a zero-width lookahead, so nothing is consumed: a label inside
+        # another field's label or value is still seen, exactly as a per-field search sees it
+        pattern = '|'.join(
+            rf'(?={re.escape(name)}[:\s]+(?P<{group}>[^\n]+))' for group, name in groups.items()
+        )
+        return re.compile(pattern, re.IGNORECASE), groups, prefixed
+    
+    def _connector(self) -> aiohttp.TCPConnector:
+        """Pooled keep-alive connector sized for crawling a single site"""
+        return aiohttp.TCPConnector(
+            ssl=self.ssl_context,
+            limit=100,
+            limit_per_host=max(self.concurrent_requests, 10),
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+    
+    def _build_session(self) -> aiohttp.ClientSession:
+        timeout = aiohttp.ClientTimeout(total=30)
+        
+        # Better headers to avoid bot detection
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9',
+            # No br: aiohttp only decodes brotli when the optional brotli package is installed
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+        }
+        
+        return aiohttp.ClientSession(connector=self._connector(), timeout=timeout, headers=headers)
+    
+    async def __aenter__(self):
+        # Keep one session (and its pooled connections and DNS cache) across every crawl in the block
+        if self._session is None:
+            self._session = self._build_session()
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.close()
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self._parse_pool is not None:
+            # Idle workers exit quickly, but joining them still blocks - keep it off the event loop
+            await asyncio.to_thread(self._parse_pool.shutdown)
+            self._parse_pool = None
+    
+    @asynccontextmanager
+    async def _session_scope(self):
+        """The crawler's open session, or a temporary one for a standalone call"""
+        if self._session is not None:
+            yield self._session
+            return
+        async with self._build_session() as session:
+            self._session = session
+            try:
+                yield session
+            finally:
+                self._session = None
+    
+    async def _fetch_product_page(self, session, url: str):
+        """(status, html) for a product page, served or revalidated from the page cache when enabled"""
+        cached = self._cache.get(url) if self._cache else None
+        headers = {}
+        if cached:
+            etag, last_modified, body, fetched_at = cached
+            if time.time() - fetched_at < self._cache.ttl:
+                return 200, body
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
+        await self._limiter(url).wait()
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and cached:
+                self._cache.touch(url)
+                return 200, body
+            if response.status != 200:
+                return response.status, ''
+            html = await response.text()
+            
+            if self._cache:
+                self._cache.put(url, response.headers.get('ETag'), response.headers.get('Last-Modified'), html)
+            return 200, html
+    
+    def _limiter(self, url: str) -> _RateLimiter:
+        host = urlparse(url).netloc
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = _RateLimiter(self.rate_limit)
+        return limiter
+    
+    async def crawl(self, collection_url: str, writer=None, limit: int = None) -> List[Dict]:
         """Main crawl function - collection page → products → CSV data"""
         
-        self.base_url = f"{urlparse(collection_url).scheme}://{urlparse(collection_url).netloc}"
+        parsed = urlparse(collection_url)
+        self.base_url = f"{parsed.scheme}://{parsed.netloc}"
         
         print(f"🕷️  Smart Crawler - Auto-detecting site structure")
         print(f"Collection: {collection_url}")
         print("=" * 60)
         
-        # Step 1: Extract product URLs from collection page
-        print("\n📋 Step 1: Finding product links...")
-        product_urls = await self.extract_product_urls(collection_url)
-        
-        if not product_urls:
-            print("❌ No product URLs found")
-            return []
-        
-        print(f"✅ Found {len(product_urls)} products")
-        
-        # Step 2: Crawl each product
-        print(f"\n📡 Step 2: Crawling {len(product_urls)} products...")
-        products = await self.crawl_products(list(product_urls))
+        # Both steps share one session, so product fetches reuse the collection page's connection
+        async with self._session_scope():
+            # Step 1: Extract product URLs from collection page
+            print("\n📋 Step 1: Finding product links...")
+            product_urls = await self.extract_product_urls(collection_url)
+            
+            if not product_urls:
+                print("❌ No product URLs found")
+                return []
+            
+            print(f"✅ Found {len(product_urls)} products")
+            
+            # Step 2: Crawl each product
+            print(f"\n📡 Step 2: Crawling {len(product_urls)} products...")
+            products = await self.crawl_products(list(product_urls), writer, limit)
         
-        print(f"\n✅ Extracted {len(products)} products with data")
+        print(f"\n✅ Extracted {self.products_extracted} products with data")
         return products
     
     async def extract_product_urls(self, collection_url: str) -> Set[str]:
         """Auto-detect product links on collection page"""
         
-        connector = aiohttp.TCPConnector(ssl=self.ssl_context)
-        timeout = aiohttp.ClientTimeout(total=30)
-        
-        # Better headers to avoid bot detection
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        async with self._session_scope() as session:
+            await self._limiter(collection_url).wait()
             async with session.get(collection_url) as response:
                 if response.status != 200:
                     print(f"❌ Failed to load collection page: {response.status}")
                     return set()
                 
                 html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
+                soup = BeautifulSoup(html, HTML_PARSER)
                 
                 # Smart detection: find links that look like product detail pages
                 product_urls = set()
                 
-                # Common patterns for product detail URLs
-                product_patterns = [
-                    r'/p/\d+',           # Total Wine: /p/123456
-                    r'/dp/[A-Z0-9]+',    # Amazon: /dp/B07ABC123
-                    r'/products/[\w-]+', # Shopify stores: /products/product-name
-                    r'/item/\d+',        # eBay: /item/123456
-                ]
-                
                 all_links = soup.find_all('a', href=True)
                 
                 for link in all_links:
                     href = link['href']
                     
                     # Check if it matches any product pattern
-                    for pattern in product_patterns:
-                        if re.search(pattern, href):
-                            full_url = urljoin(self.base_url, href)
+                    for pattern in _PRODUCT_LINK_PATTERNS:
+                        if pattern.search(href):
+                            # base_url is a bare origin, so root-relative links just append
+                            if href.startswith('/') and not href.startswith('//'):
+                                full_url = self.base_url + href
+                            else:
+                                full_url = _absolute_url(self.base_url, href)
                             # Avoid duplicates from different URLs pointing to same product
                             product_urls.add(full_url.split('?')[0])  # Remove query params
                             break
                 
                 return product_urls
     
-    async def crawl_products(self, product_urls: List[str]) -> List[Dict]:
-        """Crawl product detail pages and extract data"""
-        
-        connector = aiohttp.TCPConnector(ssl=self.ssl_context)
-        timeout = aiohttp.ClientTimeout(total=30)
-        products = []
-        
-        # Better headers to avoid bot detection
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-        }
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
-            for i, url in enumerate(product_urls, 1):
-                print(f"  [{i}/{len(product_urls)}] {url}")
+    async def crawl_products(self, product_urls: List[str], writer=None, limit: int = None) -> List[Dict]:
+        """Crawl product detail pages and extract data; with a csv.writer, rows (in csv_fields order) are streamed out instead of kept.
+        
+        limit caps extracted products, not pages: once it is reached, pages not yet fetched are skipped.
+        """
+        
+        semaphore = asyncio.Semaphore(self.concurrent_requests)
+        loop = asyncio.get_running_loop()
+        total = len(product_urls)
+        self.products_extracted = 0
+        
+        async def fetch_and_parse(i: int, url: str):
+            async with semaphore:
+                if limit and self.products_extracted >= limit:
+                    return None
+                print(f"  [{i}/{total}] {url}")
                 
                 try:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            html = await response.text()
-                            product = self.extract_product_data(html, url)
-                            
-                            if product.get('title'):
-                                products.append(product)
-                                print(f"      ✅ {product['title']}")
-                            else:
-                                print(f"      ⚠️  No title found")
-                        else:
-                            print(f"      ❌ HTTP {response.status}")
-                            
+                    status, html = await self._fetch_product_page(session, url)
+                    if status != 200:
+                        print(f"      ❌ HTTP {status}")
+                        return None
+                    
+                    # Parsing is CPU-bound; worker processes spread it across cores
+                    product = await loop.run_in_executor(parse_pool, _parse_worker, html, url)
+                    
+                    if product.get('title'):
+                        # Pages already in flight can finish after the limit was reached elsewhere
+                        if limit and self.products_extracted >= limit:
+                            return None
+                        print(f"      ✅ {product['title']}")
+                        self.products_extracted += 1
+                        if writer is not None:
+                            # Only the event loop thread writes, so rows never interleave
+                            writer.writerow(self._csv_row(product))
+                            return None
+                        return product
+                    print(f"      ⚠️  No title found")
+                    return None
+                    
                 except Exception as e:
                     print(f"      ❌ {e}")
-                
-                await asyncio.sleep(0.5)  # Rate limiting
+                    return None
+        
+        parse_pool = self._pool()
+        async with self._session_scope() as session:
+            results = await asyncio.gather(
+                *(fetch_and_parse(i, url) for i, url in enumerate(product_urls, 1)),
+                return_exceptions=True,
+            )
+        
+        # gather keeps input order, so output matches the sequential crawl
+        products = [r for r in results if isinstance(r, dict)]
         
         return products
     
     def extract_product_data(self, html: str, url: str) -> Dict:
         """Smart extraction - auto-detects where data is on the page"""
         
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, HTML_PARSER)
         product = {}
         
         # STANDARD FIELDS (auto-detected)
@@ -189,17 +458,27 @@ class SmartCrawler:
         product['collection'] = self.auto_extract_collection(soup, url)
         
         # EXTRA FIELDS (product-specific)
-        for field_name in self.extra_fields:
-            product[field_name] = self.auto_extract_field(soup, field_name)
+        product.update(self.auto_extract_fields(soup))
         
+        # Don't keep the page tree alive between pages
+        self._last_page_text = None
         return product
     
+    def _page_text(self, soup) -> str:
+        """Full page text, walked once per soup and shared by every text-pattern extractor"""
+        cached = self._last_page_text
+        if cached is not None and cached[0] is soup:
+            return cached[1]
+        text = soup.get_text()
+        self._last_page_text = (soup, text)
+        return text
+    
     def auto_extract_title(self, soup) -> str:
         """Auto-detect product title"""
         # Try h1 first
         h1 = soup.find('h1')
         if h1:
-            return h1.get_text(strip=True)
+            return _tag_text(h1)
         
         # Try meta title
         meta_title = soup.find('meta', property='og:title')
@@ -211,21 +490,16 @@ class SmartCrawler:
     def auto_extract_price(self, soup, price_type: str) -> str:
         """Auto-detect price - current or compare/msrp"""
         
-        text = soup.get_text()
+        text = self._page_text(soup)
         
         if price_type == 'current':
             # Look for price near "price", "now", or standalone
-            price_match = re.search(r'\$(\d+\.\d{2})', text)
+            price_match = _PRICE_RE.search(text)
             return price_match.group(1) if price_match else ''
         else:
             # Look for "was", "originally", "list", "msrp", "compare"
-            compare_patterns = [
-                r'(?:was|originally|list price|msrp|previously|compare at).*?\$(\d+\.\d{2})',
-                r'\$(\d+\.\d{2}).*?(?:was|originally|list)',
-            ]
-            
-            for pattern in compare_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in _COMPARE_PRICE_PATTERNS:
+                match = pattern.search(text)
                 if match:
                     return match.group(1)
         
@@ -234,19 +508,13 @@ class SmartCrawler:
     def auto_extract_sku(self, soup, url: str) -> str:
         """Auto-detect SKU"""
         # Try URL first
-        patterns = [
-            r'/p/([^/?]+)',      # Total Wine
-            r'/dp/([^/?]+)',     # Amazon
-            r'/item/(\d+)',      # eBay
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        for pattern in _SKU_URL_RES:
+            match = pattern.search(url)
             if match:
                 return match.group(1)
         
         # Try page text
-        sku_match = re.search(r'SKU[:\s]+([A-Z0-9-]+)', soup.get_text(), re.IGNORECASE)
+        sku_match = _SKU_TEXT_RE.search(self._page_text(soup))
         if sku_match:
             return sku_match.group(1)
         
@@ -260,12 +528,12 @@ class SmartCrawler:
             return meta_brand.get('content', '').strip()
         
         # Try links with "brand" in them
-        brand_link = soup.find('a', href=re.compile(r'/brand/', re.I))
+        brand_link = soup.find('a', href=_BRAND_HREF_RE)
         if brand_link:
-            return brand_link.get_text(strip=True)
+            return _tag_text(brand_link)
         
         # Try text pattern
-        brand_match = re.search(r'Brand[:\s]+([A-Za-z0-9\s&-]+)', soup.get_text())
+        brand_match = _BRAND_TEXT_RE.search(self._page_text(soup))
         if brand_match:
             return brand_match.group(1).strip()
         
@@ -278,10 +546,13 @@ class SmartCrawler:
         
         for img in images:
             src = img.get('src') or img.get('data-src')
-            if src and any(ext in src.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
+            if not src:
+                continue
+            lowered = src.lower()
+            if any(ext in lowered for ext in ('.jpg', '.jpeg', '.png', '.webp')):
                 # Skip tiny images (logos, icons)
-                if 'logo' not in src.lower() and 'icon' not in src.lower():
-                    return urljoin(url, src)
+                if 'logo' not in lowered and 'icon' not in lowered:
+                    return _absolute_url(url, src)
         
         return ''
     
@@ -293,20 +564,20 @@ class SmartCrawler:
             return meta_desc.get('content', '').strip()
         
         # Try common description containers
-        desc_containers = soup.find_all(['div', 'p'], class_=re.compile(r'description|details|about', re.I))
+        desc_containers = soup.find_all(['div', 'p'], class_=_DESC_CLASS_RE)
         if desc_containers:
-            return desc_containers[0].get_text(strip=True)[:500]  # First 500 chars
+            return _tag_text(desc_containers[0])[:500]  # First 500 chars
         
         return ''
     
     def auto_extract_collection(self, soup, url: str) -> str:
         """Auto-detect collection from URL or breadcrumbs"""
         # Try breadcrumbs
-        breadcrumbs = soup.find('nav', attrs={'aria-label': re.compile(r'breadcrumb', re.I)})
+        breadcrumbs = soup.find('nav', attrs={'aria-label': _BREADCRUMB_RE})
         if breadcrumbs:
             links = breadcrumbs.find_all('a')
             if len(links) > 1:
-                return links[-1].get_text(strip=True)
+                return _tag_text(links[-1])
         
         # Try URL path
         path_parts = urlparse(url).path.split('/')
@@ -315,13 +586,41 @@ class SmartCrawler:
         
         return ''
     
+    def auto_extract_fields(self, soup) -> Dict[str, str]:
+        """Auto-detect every extra field in one scan of the page text"""
+        found = dict.fromkeys(self.extra_fields, '')
+        if not self.extra_fields:
+            return found
+        text = self._page_text(soup)
+        
+        for field_name in self._prefixed_fields:
+            found[field_name] = self._search_field(text, field_name)
+        if self._fields_re is None:
+            return found
+        
+        # The first hit of each field wins, even when its value strips to '' - as a per-field search
+        remaining = set(self._field_groups)
+        for match in self._fields_re.finditer(text):
+            group = match.lastgroup
+            if group not in remaining:
+                continue
+            found[self._field_groups[group]] = match.group(group).strip()
+            remaining.discard(group)
+            if not remaining:
+                break
+        
+        return found
+    
     def auto_extract_field(self, soup, field_name: str) -> str:
         """Auto-detect custom fields by name pattern matching"""
-        text = soup.get_text()
-        
-        # Try pattern: "Field Name: Value"
-        pattern = rf'{field_name}[:\s]+([^\n]+)'
-        match = re.search(pattern, text, re.IGNORECASE)
+        return self._search_field(self._page_text(soup), field_name)
+    
+    def _search_field(self, text: str, field_name: str) -> str:
+        """First "Field Name: Value" hit for one field"""
+        pattern = self._field_res.get(field_name)
+        if pattern is None:
+            pattern = re.compile(rf'{re.escape(field_name)}[:\s]+([^\n]+)', re.IGNORECASE)
+        match = pattern.search(text)
         if match:
             return match.group(1).strip()
         
@@ -333,30 +632,31 @@ async def main():
     parser.add_argument("--product", default="generic", help="Product type (optional)")
     parser.add_argument("--output", required=True, help="Output CSV file")
     parser.add_argument("--limit", type=int, help="Max products to crawl (optional)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Product pages fetched in parallel")
+    parser.add_argument("--cache", help="SQLite file caching product pages between runs (optional)")
     
     args = parser.parse_args()
     
     # Create smart crawler
-    crawler = SmartCrawler(args.product)
+    crawler = SmartCrawler(args.product, concurrent_requests=args.concurrency, cache_path=args.cache)
     
-    # Crawl
-    products = await crawler.crawl(args.url)
+    all_fields = crawler.csv_fields
     
-    if args.limit:
-        products = products[:args.limit]
+    # Crawl, writing each product as soon as it is extracted; a 1 MiB buffer
+    # turns per-row writes into occasional large ones. Opening and the final
+    # flush run in a thread so a slow disk never stalls in-flight fetches.
+    f = await asyncio.to_thread(open, args.output, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+    try:
+        # Positional rows skip DictWriter's per-cell dict lookups
+        writer = csv.writer(f)
+        writer.writerow(all_fields)
+        async with crawler:
+            await crawler.crawl(args.url, writer=writer, limit=args.limit)
+    finally:
+        await asyncio.to_thread(f.close)
     
-    # Save to CSV
-    if products:
-        # Standard fields
-        standard_fields = ['title', 'price', 'collection', 'description', 'msrp', 'brand', 'sku', 'image_url']
-        all_fields = standard_fields + crawler.extra_fields
-        
-        with open(args.output, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=all_fields, extrasaction='ignore')
-            writer.writeheader()
-            writer.writerows(products)
-        
-        print(f"\n✅ Saved {len(products)} products to {args.output}")
+    if crawler.products_extracted:
+        print(f"\n✅ Saved {crawler.products_extracted} products to {args.output}")
         print(f"📊 Fields: {', '.join(all_fields)}")
     else:
         print("\n❌ No products extracted")
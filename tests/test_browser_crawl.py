@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Regression checks for the single-pass snapshot scanner in browser_crawl"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from browser_crawl import BrowserCrawler
+
+class ScanSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.crawler = BrowserCrawler("generic")
+    
+    def test_brand_does_not_swallow_sku(self):
+        found = self.crawler._scan_snapshot("Brand: Foo SKU 12345")
+        self.assertEqual(found['sku'], '12345')
+        self.assertEqual(found['brand'], 'Foo SKU 12345')
+    
+    def test_brand_does_not_swallow_image(self):
+        found = self.crawler._scan_snapshot('Brand: Foo\n- img src="/bottle.jpg"')
+        self.assertEqual(found['image'], '/bottle.jpg')
+    
+    def test_compare_at_price_does_not_hide_current_price(self):
+        found = self.crawler._scan_snapshot('heading "Cab" [level=1]\nwas $20.00 now $15.00')
+        self.assertEqual(found['title'], 'Cab')
+        self.assertEqual(found['msrp'], '20.00')
+        self.assertEqual(found['price'], '20.00')
+    
+    def test_image_needs_img_line(self):
+        self.assertEqual(self.crawler._scan_snapshot('link src="/a.png"')['image'], '')
+        self.assertEqual(self.crawler._scan_snapshot('src="/a.png" img')['image'], '/a.png')
+
+class SkuFromUrlTest(unittest.TestCase):
+    def test_patterns_keep_their_priority(self):
+        crawler = BrowserCrawler("generic")
+        self.assertEqual(crawler._extract_sku_from_url('/products/red-123/p/987'), '987')
+        self.assertEqual(crawler._extract_sku_from_url('/products/red-123'), '123')
+
+if __name__ == "__main__":
+    unittest.main()